@@ -0,0 +1,43 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from board_engine import BoardGenerator, Board
+
+# ====== Batch generation          ==============================================
+# Boards are generated from seeds only, so a seed gives the same board in any process and in any order.
+_worker_generator = None
+_worker_encode = None
+
+def init_worker(generator_options, encode):
+    """
+    Initializer of a process pool that generates boards, for callers running a pool of their own.
+    encode turns every board into what the worker sends back and has to be a module level function.
+    """
+    global _worker_generator, _worker_encode
+    _worker_generator = BoardGenerator(**generator_options)
+    _worker_encode = encode
+
+def generate_encoded_board(job):
+    """encode(board) for a (resource_counts, seed) job, in a process started with init_worker"""
+    resource_counts, seed = job
+    return _worker_encode(_worker_generator.generate(resource_counts, seed=seed))
+
+def board_seeds(base_seed, num_boards):
+    """Board i of a run uses base_seed + i, any single board can be regenerated from its own seed"""
+    return range(base_seed, base_seed + num_boards)
+
+def iter_boards(resource_counts, seeds, processes=1, chunksize=16, generator_options=None, encode=Board.to_dict):
+    """
+    Yields encode(board) for every seed, in the order of seeds, board.to_dict() unless told otherwise
+    (board_archive.encode_board gives archive records). encode has to be a module level function for processes > 1.
+    processes > 1 spreads the seeds over a process pool, the boards are identical to a serial run.
+    """
+    generator_options = dict(generator_options or {})
+    if processes <= 1:
+        generator = BoardGenerator(**generator_options)
+        for seed in seeds:
+            yield encode(generator.generate(resource_counts, seed=seed))
+        return
+
+    jobs = ((resource_counts, seed) for seed in seeds)
+    with ProcessPoolExecutor(processes, initializer=init_worker, initargs=(generator_options, encode)) as pool:
+        yield from pool.map(generate_encoded_board, jobs, chunksize=chunksize)
@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import tracemalloc
+
+import numpy as np
+
+# ====== Imports from local files  ==============================================
+from globals import LAND_RESOURCE_RATIOS
+from board_engine import BoardGenerator
+from topology import BoardTemplate, hexagonal_land_coords, rectangular_land_coords
+
+# Base game up to the mega boards, below 100 runs the hexagonal path and from 100 the rectangular one
+DEFAULT_SIZES = [19, 37, 61, 99, 100, 500, 2000, 10000, 50000]
+PHASES = ["skeleton", "template", "build_final_grid", "separate_resources", "assign_numbers", "place_harbors", "paint"]
+# paintEvent is timed on a fixed window so the numbers do not depend on the screen
+PAINT_VIEWPORT = (1600, 1000)
+
+def resource_counts_for(num_land_tiles):
+    """Base game ratios scaled to exactly num_land_tiles tiles"""
+    total_parts = sum(LAND_RESOURCE_RATIOS.values())
+    counts = {res: num_land_tiles * parts // total_parts for res, parts in LAND_RESOURCE_RATIOS.items()}
+    for res in sorted(LAND_RESOURCE_RATIOS, key=LAND_RESOURCE_RATIOS.get, reverse=True):
+        if sum(counts.values()) == num_land_tiles: break
+        counts[res] += 1
+    return counts
+
+# ====== Phase runner              ==============================================
+class PipelineRun:
+    """
+    Runs the stages of BoardGenerator.generate one at a time so each can be timed on its own.
+    Every stage works on the output of the one before, seeded so runs are comparable.
+    """
+    def __init__(self, num_land_tiles, seed, paint_widget=None):
+        self.num_land_tiles = num_land_tiles
+        self.orientation = 'pointy' if num_land_tiles < 100 else 'flat'
+        self.generator = BoardGenerator()
+        self.rng = random.Random(seed)
+        self.paint_widget = paint_widget
+
+    def skeleton(self):
+        if self.orientation == 'pointy': hexagonal_land_coords(self.num_land_tiles)
+        else: rectangular_land_coords(self.num_land_tiles)
+
+    def template(self):
+        # built directly, the cache would hide the cost after the first repeat
+        self.board_template = BoardTemplate(self.num_land_tiles, self.orientation)
+
+    def build_final_grid(self):
+        resource_pool = [res for res, count in sorted(resource_counts_for(self.num_land_tiles).items()) for _ in range(count)]
+        self.rng.shuffle(resource_pool)
+        self.board = self.generator.build_final_grid(self.board_template, resource_pool)
+
+    def separate_resources(self):
+        self.generator.separate_resources(self.board, self.rng)
+
+    def assign_numbers(self):
+        self.generator.assign_numbers(self.board, self.rng)
+
+    def place_harbors(self):
+        self.board.harbor_counts = self.generator.place_harbors(self.board, self.num_land_tiles, self.rng)
+
+    def prepare_paint(self):
+        from PyQt6.QtGui import QImage
+        self.paint_widget.set_board(self.board)
+        self.paint_widget.resize(self.paint_widget.minimumSize())
+        self.image = QImage(*PAINT_VIEWPORT, QImage.Format.Format_ARGB32)
+
+    def paint(self):
+        from PyQt6.QtGui import QRegion
+        self.paint_widget.render(self.image, sourceRegion=QRegion(0, 0, *PAINT_VIEWPORT))
+
+def make_paint_widget():
+    """Offscreen HexagonGridWidget, None when PyQt6 is not installed"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt6.QtWidgets import QApplication
+        from landscape import HexagonGridWidget
+    except ImportError:
+        return None
+    # kept alive for the whole run, PyQt6 is only imported here so the engine phases run without it
+    global _app
+    _app = QApplication.instance() or QApplication(sys.argv[:1])
+    return HexagonGridWidget()
+
+def run_phases(num_land_tiles, seed, phases, paint_widget, measure_memory):
+    """Runs the pipeline once, returns {phase: seconds} or {phase: peak bytes}"""
+    run = PipelineRun(num_land_tiles, seed, paint_widget)
+    results = {}
+    for phase in PHASES:
+        if phase == "paint" and paint_widget is None: continue
+        step = getattr(run, phase)
+        prepare = getattr(run, "prepare_" + phase, None)
+        if prepare is not None: prepare()
+        if phase not in phases:
+            step()
+            continue
+        if measure_memory:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            step()
+            results[phase] = tracemalloc.get_traced_memory()[1] - before
+            tracemalloc.stop()
+        else:
+            start = time.perf_counter()
+            step()
+            results[phase] = time.perf_counter() - start
+    return results
+
+def scaling_exponents(results, phases):
+    """Slope of log(time) over log(tiles) per phase and code path, about 1 is linear and 2 quadratic"""
+    exponents = {}
+    for orientation in ("pointy", "flat"):
+        for phase in phases:
+            points = [(r["tiles"], r["wall_s"]["median"]) for r in results
+                      if r["orientation"] == orientation and r["phase"] == phase and r["wall_s"]["median"] > 0]
+            if len(points) < 2: continue
+            tiles, seconds = np.log([p[0] for p in points]), np.log([p[1] for p in points])
+            if np.ptp(tiles) == 0: continue
+            exponents[f"{orientation}/{phase}"] = round(float(np.polyfit(tiles, seconds, 1)[0]), 3)
+    return exponents
+
+def run_benchmark(sizes, repeat, seed, phases, with_paint=True, with_memory=True, log=print):
+    paint_widget = make_paint_widget() if with_paint and "paint" in phases else None
+    results = []
+    for num_land_tiles in sizes:
+        timings = {phase: [] for phase in phases}
+        for i in range(repeat):
+            for phase, seconds in run_phases(num_land_tiles, seed + i, phases, paint_widget, False).items():
+                timings[phase].append(seconds)
+        peaks = run_phases(num_land_tiles, seed, phases, paint_widget, True) if with_memory else {}
+        orientation = 'pointy' if num_land_tiles < 100 else 'flat'
+        for phase, samples in timings.items():
+            if not samples: continue
+            results.append({
+                "tiles": num_land_tiles,
+                "orientation": orientation,
+                "phase": phase,
+                "wall_s": {"min": min(samples), "median": statistics.median(samples), "max": max(samples)},
+                "peak_bytes": peaks.get(phase),
+            })
+            log(f"{num_land_tiles:>7} {orientation:<6} {phase:<20} {statistics.median(samples) * 1000:>10.2f} ms"
+                + (f" {peaks[phase] / 2**20:>9.2f} MiB" if phase in peaks else ""))
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+            "paint_viewport": PAINT_VIEWPORT,
+        },
+        "results": results,
+        "scaling": scaling_exponents(results, phases),
+    }
+
+def compare(old, new, log=print):
+    """Prints new / old median time for every (tiles, phase) the two runs share"""
+    old_medians = {(r["tiles"], r["phase"]): r["wall_s"]["median"] for r in old["results"]}
+    for r in new["results"]:
+        before = old_medians.get((r["tiles"], r["phase"]))
+        if before:
+            log(f"{r['tiles']:>7} {r['phase']:<20} {r['wall_s']['median'] / before:>7.2f}x")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time each generation phase over a range of board sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="land tile counts to run")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per size, the median is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--phases", nargs="+", default=PHASES, choices=PHASES)
+    parser.add_argument("--no-paint", action="store_true", help="skip paintEvent, PyQt6 is not needed then")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="json file for the results")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, args.repeat, args.seed, args.phases, not args.no_paint, not args.no_memory)
+    for name, exponent in report["scaling"].items():
+        print(f"scaling {name:<30} n^{exponent}")
+    with open(args.output, "w") as out:
+        json.dump(report, out, indent=1)
+    if args.compare:
+        with open(args.compare) as old:
+            compare(json.load(old), report)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
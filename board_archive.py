@@ -0,0 +1,214 @@
+import os
+import sys
+import mmap
+import json
+import struct
+import argparse
+from array import array
+
+import numpy as np
+
+from board_store import Board, HARBOR_TYPES
+from topology import BoardTemplate, get_template
+
+# ====== File layout               ==============================================
+# <archive>      data file: FILE_HEADER, then one record per board, each a BOARD_HEADER followed by
+#                num_tiles TILE_RECORDs in template order (water first, then land).
+# <archive>.idx  index file: FILE_HEADER, then one INDEX_ENTRY per board, board i's entry sits at a fixed offset.
+# Records are written before their index entry, so a cut off append never indexes a partial board.
+# Everything is little endian.
+DATA_MAGIC, INDEX_MAGIC = b"MCATBRD1", b"MCATIDX1"
+ARCHIVE_VERSION = 1
+FILE_HEADER = struct.Struct("<8sI4x")
+# Seeds are stored as signed 64 bit integers
+SEED_RANGE = range(-2**63, 2**63)
+# seed, has seed, orientation, shape, core rows, core cols, num tiles, num water, count of every harbor type
+BOARD_HEADER = struct.Struct(f"<qBBBxiiII{len(HARBOR_TYPES) - 1}I")
+# seed, offset of the board record, num tiles, has seed
+INDEX_ENTRY = struct.Struct("<qQIB3x")
+INDEX_DTYPE = np.dtype([("seed", "<i8"), ("offset", "<u8"), ("num_tiles", "<u4"), ("has_seed", "u1"), ("pad", "V3")])
+# Index entries written per flush when appending many records
+APPEND_BATCH = 4096
+TILE_RECORD = np.dtype([("r", "<i4"), ("c", "<i4"), ("resource", "i1"), ("number", "i1"),
+                        ("harbor", "i1"), ("orientation", "i1")])
+
+ORIENTATIONS = ["pointy", "flat"]
+BOARD_SHAPES = ["", "Hexagonal", "Rectangular", "Custom"]
+# Shapes whose template can come from the cache, anything else is rebuilt from the stored coordinates
+CACHED_SHAPES = {"Hexagonal": 'pointy', "Rectangular": 'flat'}
+
+# ====== Encoding                  ==============================================
+def encode_board(board):
+    """One archive record as bytes, what batch workers send back instead of the board itself"""
+    if board.seed is not None and board.seed not in SEED_RANGE:
+        raise ValueError(f"board archives store seeds as 64 bit signed integers, {board.seed} does not fit")
+    template = board.template
+    num_tiles = template.num_tiles if template is not None else 0
+    num_water = template.num_water if template is not None else 0
+    harbor_counts = [board.harbor_counts.get(harbor, 0) for harbor in HARBOR_TYPES[1:]]
+    header = BOARD_HEADER.pack(board.seed if board.seed is not None else 0, board.seed is not None,
+                               ORIENTATIONS.index(board.orientation), BOARD_SHAPES.index(board.board_shape),
+                               board.core_rows, board.core_cols, num_tiles, num_water, *harbor_counts)
+    tiles = np.empty(num_tiles, dtype=TILE_RECORD)
+    if num_tiles:
+        tiles["r"], tiles["c"] = template.rows, template.cols
+        tiles["resource"] = np.frombuffer(board.resources, dtype=np.int8)
+        tiles["number"] = np.frombuffer(board.numbers, dtype=np.int8)
+        tiles["harbor"] = np.frombuffer(board.harbors, dtype=np.int8)
+        tiles["orientation"] = np.frombuffer(board.harbor_orientations, dtype=np.int8)
+    return header + tiles.tobytes()
+
+def _template_for(tiles, num_water, orientation, board_shape, core_rows, core_cols):
+    """The cached template when it has exactly these coordinates, otherwise one built from them"""
+    num_land_tiles = len(tiles) - num_water
+    if CACHED_SHAPES.get(board_shape) == orientation and num_land_tiles > 0:
+        # called like BoardGenerator.generate does, so the lru cache hands back the very same template
+        template = get_template(num_land_tiles, orientation, None, None)
+        if (template.num_water == num_water and template.core_rows == core_rows and template.core_cols == core_cols
+                and np.array_equal(np.frombuffer(template.rows, dtype=np.int32), tiles["r"])
+                and np.array_equal(np.frombuffer(template.cols, dtype=np.int32), tiles["c"])):
+            return template
+    coords = list(zip(tiles["r"].tolist(), tiles["c"].tolist()))
+    return BoardTemplate.from_coords(coords[:num_water], coords[num_water:], orientation, board_shape, core_rows, core_cols)
+
+def decode_board(buffer, offset=0):
+    """Board from the record at offset of buffer (bytes or an mmap), the tiles are copied straight into its arrays"""
+    (seed, has_seed, orientation, shape, core_rows, core_cols, num_tiles, num_water,
+     *harbor_counts) = BOARD_HEADER.unpack_from(buffer, offset)
+    orientation, board_shape = ORIENTATIONS[orientation], BOARD_SHAPES[shape]
+    board = Board(None, orientation, board_shape, core_rows, core_cols,
+                  dict(zip(HARBOR_TYPES[1:], harbor_counts)) if any(harbor_counts) else {}, seed if has_seed else None)
+    if not num_tiles:
+        return board
+    tiles = np.frombuffer(buffer, dtype=TILE_RECORD, count=num_tiles, offset=offset + BOARD_HEADER.size)
+    board.template = _template_for(tiles, num_water, orientation, board_shape, core_rows, core_cols)
+    board.resources = array('b', tiles["resource"].tobytes())
+    board.numbers = array('b', tiles["number"].tobytes())
+    board.harbors = array('b', tiles["harbor"].tobytes())
+    board.harbor_orientations = array('b', tiles["orientation"].tobytes())
+    return board
+
+# ====== BoardArchive              ==============================================
+class BoardArchive:
+    """
+    Append only file of boards with O(1) access to board i through a fixed width index, read through mmap
+    so opening an archive of millions of boards reads nothing but the two headers.
+    mode "r" only reads, "a" also appends and creates the files when they are missing.
+    """
+    def __init__(self, path, mode="r"):
+        if mode not in ("r", "a"):
+            raise ValueError(f"mode must be 'r' or 'a', not {mode!r}")
+        self.path, self.index_path, self.mode = path, path + ".idx", mode
+        if mode == "a":
+            for file_path, magic in ((self.path, DATA_MAGIC), (self.index_path, INDEX_MAGIC)):
+                if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+                    with open(file_path, "wb") as new_file:
+                        new_file.write(FILE_HEADER.pack(magic, ARCHIVE_VERSION))
+        file_mode = "r+b" if mode == "a" else "rb"
+        self.data_file, self.index_file = open(self.path, file_mode), open(self.index_path, file_mode)
+        self.data, self.index = None, None
+        self._map()
+        for name, view, magic in ((self.path, self.data, DATA_MAGIC), (self.index_path, self.index, INDEX_MAGIC)):
+            found, version = FILE_HEADER.unpack_from(view, 0)
+            if found != magic or version != ARCHIVE_VERSION:
+                self.close()
+                raise ValueError(f"{name} is not a version {ARCHIVE_VERSION} board archive")
+
+    def _map(self):
+        """(Re)maps both files, after an append they are longer than the old maps"""
+        for name in ("data", "index"):
+            view = getattr(self, name)
+            if view is not None: view.close()
+            file = self.data_file if name == "data" else self.index_file
+            setattr(self, name, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self): return (len(self.index) - FILE_HEADER.size) // INDEX_ENTRY.size
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc_info): self.close()
+
+    def close(self):
+        for view in (self.data, self.index):
+            if view is not None: view.close()
+        self.data = self.index = None
+        self.data_file.close()
+        self.index_file.close()
+
+    def entry(self, i):
+        """(seed, offset, num_tiles, has_seed) of board i"""
+        if not 0 <= i < len(self):
+            raise IndexError(f"board {i} is not in an archive of {len(self)}")
+        return INDEX_ENTRY.unpack_from(self.index, FILE_HEADER.size + i * INDEX_ENTRY.size)
+
+    def load(self, i):
+        """Board i, the cost only depends on the size of that board"""
+        return decode_board(self.data, self.entry(i)[1])
+
+    __getitem__ = load
+
+    def find_seed(self, seed):
+        """Index of the first board generated from seed or None, one vectorized pass over the index"""
+        entries = np.frombuffer(self.index, dtype=INDEX_DTYPE, count=len(self), offset=FILE_HEADER.size)
+        found = np.flatnonzero((entries["seed"] == seed) & (entries["has_seed"] == 1))
+        del entries   # the map can not be closed while a numpy view of it is alive
+        return int(found[0]) if len(found) else None
+
+    def load_seed(self, seed):
+        i = self.find_seed(seed)
+        if i is None:
+            raise KeyError(seed)
+        return self.load(i)
+
+    def append_record(self, record):
+        """Appends a record made by encode_board, returns the index of the new board"""
+        self.extend_records((record,))
+        return len(self) - 1
+
+    def append(self, board): return self.append_record(encode_board(board))
+
+    def extend_records(self, records):
+        """
+        Appends records made by encode_board, for batch runs. The data is flushed before the index entries
+        that point at it, every APPEND_BATCH boards, and the files are remapped once at the end.
+        Returns how many boards were added.
+        """
+        if self.mode != "a":
+            raise ValueError("the archive was opened read only")
+        offset, entries, added = self.data_file.seek(0, os.SEEK_END), [], 0
+        self.index_file.seek(0, os.SEEK_END)
+        for record in records:
+            seed, has_seed, _, _, _, _, num_tiles = BOARD_HEADER.unpack_from(record, 0)[:7]
+            self.data_file.write(record)
+            entries.append(INDEX_ENTRY.pack(seed, offset, num_tiles, has_seed))
+            offset += len(record)
+            if len(entries) == APPEND_BATCH:
+                added += self._write_entries(entries)
+        added += self._write_entries(entries)
+        self._map()
+        return added
+
+    def _write_entries(self, entries):
+        self.data_file.flush()
+        self.index_file.write(b"".join(entries))
+        self.index_file.flush()
+        count = len(entries)
+        entries.clear()
+        return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print boards of an archive as json, or how many it holds.")
+    parser.add_argument("archive")
+    parser.add_argument("-i", "--index", type=int, default=None, help="board to print")
+    parser.add_argument("--seed", type=int, default=None, help="print the board generated from this seed")
+    args = parser.parse_args(argv)
+    with BoardArchive(args.archive) as archive:
+        if args.index is None and args.seed is None:
+            print(len(archive))
+            return 0
+        board = archive.load(args.index) if args.index is not None else archive.load_seed(args.seed)
+        print(json.dumps(board.to_dict(), separators=(",", ":")))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import sys
+import json
+import random
+import argparse
+
+# ====== Imports from local files  ==============================================
+# Only the Qt free engine is used here, so this runs on machines without a display or PyQt6
+import tracing
+from globals import LAND_RESOURCES, LAND_RESOURCE_RATIOS
+from batch import iter_boards, board_seeds
+from board_engine import BoardGenerator
+from board_archive import BoardArchive, encode_board, SEED_RANGE
+from topology import mask_land_cells
+
+def resource_counts_from_args(args):
+    """Scales the base game ratios by --sets, then applies any per resource override"""
+    counts = {res: LAND_RESOURCE_RATIOS[res] * args.sets for res in LAND_RESOURCES}
+    for res in LAND_RESOURCES:
+        override = getattr(args, res)
+        if override is not None:
+            counts[res] = override
+    return counts
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate MegaCatan boards without the GUI, one json board per line.")
+    parser.add_argument("-n", "--boards", type=int, default=1, help="number of boards to generate")
+    parser.add_argument("-s", "--sets", type=int, default=1, help="number of base game sets, scales every resource by its ratio")
+    for res in LAND_RESOURCES:
+        parser.add_argument(f"--{res}", type=int, default=None, help=f"exact number of {res} tiles")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the first board, board i uses seed + i (random when left out)")
+    parser.add_argument("-p", "--processes", type=int, default=1, help="worker processes, the boards do not depend on this")
+    parser.add_argument("--aspect-ratio", type=float, default=None, help="width / height of rectangular boards (100+ tiles), shortest coastline when left out")
+    parser.add_argument("--mask", default=None, help="text file drawing the board shape, '.' is water and any other character land")
+    parser.add_argument("-o", "--output", default="-", help="file to write to, '-' for stdout")
+    parser.add_argument("--trace", default=None, help="write a json trace of the generation stages of every board to this file, boards made in worker processes are not traced")
+    parser.add_argument("-a", "--archive", default=None, help="append the boards to this binary board archive instead of writing json")
+    return parser
+
+def read_mask(path):
+    """Mask rows of a text file, blank lines at the end are dropped"""
+    with open(path) as mask_file:
+        rows = [line.rstrip("\n") for line in mask_file]
+    while rows and not rows[-1].strip(): rows.pop()
+    return tuple(rows)
+
+def write_boards(resource_counts, seeds, processes, out, generator_options=None):
+    """Streams each board as soon as it is generated so memory does not grow with the run"""
+    for board in iter_boards(resource_counts, seeds, processes, generator_options=generator_options):
+        out.write(json.dumps(board, separators=(",", ":")))
+        out.write("\n")
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    resource_counts = resource_counts_from_args(args)
+    base_seed = args.seed if args.seed is not None else random.SystemRandom().randrange(2**62)
+    seeds = board_seeds(base_seed, args.boards)
+    # checked up front, a failing board would leave the ones before it in the data file without index entries
+    if args.archive and seeds and not (seeds[0] in SEED_RANGE and seeds[-1] in SEED_RANGE):
+        parser.error(f"--seed: archives store seeds as 64 bit signed integers, seeds {seeds[0]} to {seeds[-1]} do not all fit")
+    try:
+        generator_options = {"aspect_ratio": args.aspect_ratio, "mask": read_mask(args.mask) if args.mask else None}
+        BoardGenerator(**generator_options)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    if args.mask:
+        land_cells, num_land_tiles = len(mask_land_cells(generator_options["mask"])), sum(resource_counts.values())
+        if land_cells < num_land_tiles:
+            parser.error(f"--mask: {args.mask} has {land_cells} land cells, {num_land_tiles} are needed")
+    # the tracing history only keeps the latest runs, a listener collects every board of the run
+    runs = []
+    def collect(event, trace, name, value):
+        if event == "end": runs.append(trace)
+    if args.trace:
+        tracing.add_listener(collect)
+        tracing.enable()
+    if args.archive:
+        with BoardArchive(args.archive, "a") as archive:
+            archive.extend_records(iter_boards(resource_counts, seeds, args.processes,
+                                               generator_options=generator_options, encode=encode_board))
+    elif args.output == "-":
+        write_boards(resource_counts, seeds, args.processes, sys.stdout, generator_options)
+    else:
+        with open(args.output, "w") as out:
+            write_boards(resource_counts, seeds, args.processes, out, generator_options)
+    if args.trace:
+        tracing.remove_listener(collect)
+        tracing.write_json(args.trace, runs)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
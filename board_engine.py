@@ -0,0 +1,166 @@
+import math
+import random
+
+import tracing
+from globals import NUMBER_RATIOS, LAND_RESOURCE_RATIOS, HARBOR_RATIOS
+from separation import ResourceSeparator
+from number_placement import NumberPlacer, DEFAULT_MAX_INTERSECTION_PIPS
+from topology import get_neighbors, get_template
+from board_store import Board, RESOURCE_CODES, HARBOR_CODES
+
+class GenerationCancelled(Exception):
+    """Raised from a progress callback to abandon a generation that is no longer wanted"""
+
+# ====== BoardGenerator            ==============================================
+class BoardGenerator:
+    """
+    Generates the tiles, numbers and harbors of a board without any graphical dependency.
+    When the number of resource tiles is less than 100, the generator will try to
+    utilize the classic hexagonal shape of the catan board
+    When the resource tile count is greater than 100, the generator will utilize a more
+    rectangular structure.
+    separation_iterations and separation_time_budget (seconds) bound the resource separation step,
+    None leaves the separator's defaults.
+    max_intersection_pips caps the pips of the three tiles around a corner when placing numbers.
+    aspect_ratio sets the drawn width / height of rectangular boards, above 0, None keeps the coastline shortest.
+    mask is a user drawn shape (strings, see topology.mask_land_coords) used instead of either shape.
+    """
+    def __init__(self, separation_iterations=None, separation_time_budget=None,
+                 max_intersection_pips=DEFAULT_MAX_INTERSECTION_PIPS, aspect_ratio=None, mask=None):
+        self.separation_iterations = separation_iterations
+        self.separation_time_budget = separation_time_budget
+        self.max_intersection_pips = max_intersection_pips
+        if aspect_ratio is not None and not 0 < aspect_ratio < math.inf:
+            raise ValueError(f"aspect_ratio must be a positive number, not {aspect_ratio}")
+        self.aspect_ratio = aspect_ratio
+        self.mask = tuple(mask) if mask is not None else None
+
+    def build_final_grid(self, template, resource_pool, seed=None):
+        """
+        Build the grid of landscapes from the shuffled pool and surround it with water tiles.
+        Returns a Board on the template, the water ring comes first in the arrays and is already water.
+        """
+        board = Board(template, template.orientation, template.board_shape, template.core_rows, template.core_cols, seed=seed)
+        resources = board.resources
+        for index in range(template.num_water, template.num_tiles):
+            # Number is assigned later
+            resources[index] = RESOURCE_CODES[resource_pool.pop()]
+        return board
+
+    def get_clump_score(self, tile, grid_map, orientation):
+        """Calculates how many neighbors of a tile have the same resource type."""
+        if not tile or tile.resource_type in ['water', 'desert']:
+            return 0
+        score = 0
+        neighbors = [grid_map.get(n) for n in get_neighbors(tile.r, tile.c, orientation) if grid_map.get(n)]
+        for neighbor in neighbors:
+            if neighbor.resource_type == tile.resource_type:
+                score += 1
+        return score
+
+    def separate_resources(self, board, rng, progress=None):
+        """
+        Swaps resource tiles to break up clusters of the same type
+        by reducing the overall "clump score" of the board.
+        See separation.ResourceSeparator, returns the number of swaps made.
+        """
+        separator = ResourceSeparator(self.separation_iterations, self.separation_time_budget, rng=rng)
+        return separator.run(board, progress)
+
+    def assign_numbers(self, board, rng, progress=None):
+        """
+        Assign numbers after resources are finalized.
+        The token pool keeps the NUMBER_RATIOS mix, number_placement.NumberPlacer decides where they go.
+        Returns the number of tiles still breaking a placement rule (0 unless the search ran out of budget).
+        progress(fraction) is called while conflicts are being repaired.
+        """
+        productive_land_tiles = board.productive_indices()
+
+        num_productive_tiles = len(productive_land_tiles)
+        total_prop_parts = sum(NUMBER_RATIOS.values())
+        number_pool = []
+        if num_productive_tiles > 0 and total_prop_parts > 0:
+            number_pool = [num for num, parts in NUMBER_RATIOS.items() for _ in range(round(num_productive_tiles * (parts / total_prop_parts)))]
+        while len(number_pool) < num_productive_tiles: number_pool.append(rng.choice(list(NUMBER_RATIOS.keys())))
+        while len(number_pool) > num_productive_tiles: number_pool.pop()
+        rng.shuffle(number_pool)
+
+        placer = NumberPlacer(self.max_intersection_pips, rng=rng)
+        return placer.run(board, productive_land_tiles, number_pool, progress)
+
+    def place_harbors(self, board, num_land_tiles, rng):
+        """
+        Places harbors on the template's harbor slots (see topology.find_harbor_slots), returns the count of each harbor type.
+        The base game sets asked for by the land tile count are split by HARBOR_RATIOS with the largest remainder,
+        ties going to the type listed first, so generic harbors are used first and the mix holds when slots are short.
+        Slots beyond that become generic harbors. Costs O(slots), the slots follow the coastline.
+        """
+        harbor_slots = board.template.harbor_slots
+        num_harbor_slots = len(harbor_slots)
+        num_base_game_sets = num_land_tiles / sum(LAND_RESOURCE_RATIOS.values())
+
+        total_ratio = sum(HARBOR_RATIOS.values())
+        num_ratio_harbors = min(num_harbor_slots, round(total_ratio * num_base_game_sets))
+        shares = {harbor_type: num_ratio_harbors * ratio / total_ratio for harbor_type, ratio in HARBOR_RATIOS.items()}
+        harbor_counts = {harbor_type: int(share) for harbor_type, share in shares.items()}
+        leftover = num_ratio_harbors - sum(harbor_counts.values())
+        # sorted is stable, so equal remainders keep the HARBOR_RATIOS order
+        for harbor_type in sorted(shares, key=lambda h: harbor_counts[h] - shares[h])[:leftover]:
+            harbor_counts[harbor_type] += 1
+        harbor_counts['generic'] = harbor_counts.get('generic', 0) + (num_harbor_slots - num_ratio_harbors)
+
+        harbor_pool = [harbor for harbor, count in harbor_counts.items() for _ in range(count)]
+        rng.shuffle(harbor_pool)
+
+        for (index, orientation), harbor_type in zip(harbor_slots, harbor_pool):
+            board.harbors[index], board.harbor_orientations[index] = HARBOR_CODES[harbor_type], orientation
+
+        return harbor_counts
+
+    def generate(self, resource_counts, progress=None, seed=None):
+        """
+        The main grid generation orchestrator, returns a Board.
+        The board skeleton comes from the template cache, only the random assignments are redone.
+        Every random draw comes from a random.Random(seed) of its own, the same seed and counts give the same board
+        (unless separation_time_budget cuts the separation short). Without a seed a fresh one is picked and kept on the board.
+        progress is called as progress(stage, fraction) between and during the stages,
+        raising GenerationCancelled from it abandons the board.
+        """
+        report = progress if progress is not None else lambda stage, fraction: None
+        if seed is None:
+            seed = random.SystemRandom().randrange(2**63)
+        with tracing.run("generate"):
+            return self._generate(resource_counts, report, seed)
+
+    def _generate(self, resource_counts, report, seed):
+        rng = random.Random(seed)
+        num_land_tiles = sum(resource_counts.values())
+        if num_land_tiles <= 0:
+            return Board(seed=seed)
+
+        # sorted so the order the counts were given in does not change the board for a seed
+        resource_pool = [res for res, count in sorted(resource_counts.items()) for _ in range(count)]
+        rng.shuffle(resource_pool)
+
+        report("building board", 0.0)
+        orientation = 'pointy' if num_land_tiles < 100 else 'flat'
+        with tracing.phase("template"):
+            template = get_template(num_land_tiles, orientation, self.aspect_ratio, self.mask)
+        with tracing.phase("build_final_grid"):
+            board = self.build_final_grid(template, resource_pool, seed)
+        tracing.count("land_tiles", num_land_tiles)
+        tracing.count("water_tiles", template.num_water)
+
+        # tries to separate clumps of resources
+        report("separating resources", 0.1)
+        with tracing.phase("separate_resources"):
+            self.separate_resources(board, rng, lambda fraction: report("separating resources", 0.1 + 0.7 * fraction))
+        report("assigning numbers", 0.8)
+        with tracing.phase("assign_numbers"):
+            self.assign_numbers(board, rng, lambda fraction: report("assigning numbers", 0.8 + 0.1 * fraction))
+        report("placing harbors", 0.9)
+        with tracing.phase("place_harbors"):
+            board.harbor_counts = self.place_harbors(board, num_land_tiles, rng)
+        tracing.count("harbors", sum(board.harbor_counts.values()))
+        report("done", 1.0)
+        return board
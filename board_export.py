@@ -0,0 +1,121 @@
+import os
+import math
+import json
+
+import numpy as np
+
+from globals import RESOURCE_COLORS, RED_NUMBERS, HARBOR_SYMBOLS
+from board_store import RESOURCE_TYPES, HARBOR_TYPES, NO_NUMBER
+from geometry import hexagon_corners, HexSpatialIndex
+
+# Pixel hex size of exports, about 2.5 cm across a tile at 300 dpi
+DEFAULT_EXPORT_HEX_SIZE = 150
+# Side of one PNG tile, one tile is the only image held in memory
+DEFAULT_PNG_TILE_SIZE = 4096
+# Board tiles written to an SVG per write call
+SVG_CHUNK_TILES = 4096
+
+class ExportCancelled(Exception):
+    """Raised from a progress callback to abandon an export, the files written so far are removed"""
+
+def board_pixel_size(board, hex_size):
+    """Width and height in pixels of the whole board at hex_size, the same extent the widget uses"""
+    if board.template is None or not board.template.num_tiles:
+        return 0, 0
+    width, height = ((board.template.unit_centers.max(axis=0) + 1) * hex_size).tolist()
+    return math.ceil(width), math.ceil(height)
+
+# ====== Tiled PNG export          ==============================================
+def export_png_tiles(board, directory, hex_size=DEFAULT_EXPORT_HEX_SIZE, tile_size=DEFAULT_PNG_TILE_SIZE, progress=None):
+    """
+    Renders the board into tile_size x tile_size PNGs named tile_<row>_<col>.png, each saved before the next
+    is drawn, so memory stays at one tile whatever the board size. A manifest.json next to them lists the grid.
+    Needs PyQt6 and a QGuiApplication (the offscreen platform is enough). Only QImages are used, so it can run
+    off the GUI thread. progress(fraction) follows every tile, if it raises the tiles written so far are removed.
+    Returns the manifest.
+    """
+    # only imported here so the SVG export runs without PyQt6
+    from PyQt6.QtGui import QImage, QPainter, QColor
+    from landscape import TileSprites, draw_tiles
+
+    width, height = board_pixel_size(board, hex_size)
+    columns, rows = -(-width // tile_size), -(-height // tile_size)
+    os.makedirs(directory, exist_ok=True)
+    sprites = TileSprites(hex_size, board.orientation, images=True)
+    spatial_index = HexSpatialIndex(board.template.unit_centers) if board.template is not None else None
+
+    files = []
+    try:
+        for row in range(rows):
+            for column in range(columns):
+                left, top = column * tile_size, row * tile_size
+                image = QImage(min(tile_size, width - left), min(tile_size, height - top), QImage.Format.Format_RGB32)
+                image.fill(QColor("white"))
+                painter = QPainter(image)
+                painter.translate(-left, -top)
+                draw_tiles(painter, board, sprites, spatial_index, hex_size, left, top, left + image.width(), top + image.height())
+                painter.end()
+                name = f"tile_{row:03d}_{column:03d}.png"
+                if not image.save(os.path.join(directory, name)):
+                    raise OSError(f"could not write {name} to {directory}")
+                files.append({"file": name, "row": row, "column": column, "x": left, "y": top})
+                if progress is not None:
+                    progress(len(files) / (rows * columns))
+    except BaseException:
+        for written in files: os.remove(os.path.join(directory, written["file"]))
+        raise
+
+    manifest = {"width": width, "height": height, "hex_size": hex_size, "tile_size": tile_size,
+                "rows": rows, "columns": columns, "seed": board.seed, "tiles": files}
+    with open(os.path.join(directory, "manifest.json"), "w") as out:
+        json.dump(manifest, out, indent=1)
+    return manifest
+
+# ====== Streaming SVG export      ==============================================
+def _svg_color(rgb): return "#%02x%02x%02x" % tuple(rgb)
+
+def _svg_header(board, hex_size, width, height):
+    corners = hexagon_corners(board.orientation) * hex_size
+    points = " ".join(f"{x:.2f},{y:.2f}" for x, y in corners.tolist())
+    hexagons = "".join(f'<polygon id="{resource}" points="{points}" fill="{_svg_color(rgb)}"/>'
+                       for resource, rgb in RESOURCE_COLORS.items())
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+            f'width="{width}" height="{height}" viewBox="0 0 {width} {height}">\n'
+            f'<style>polygon{{stroke:#000;stroke-width:2}} text{{font-family:Arial;font-weight:bold;'
+            f'text-anchor:middle;dominant-baseline:central}} .n{{font-size:{int(hex_size * 0.5)}pt}} '
+            f'.r{{fill:red}} .h{{font-size:{int(hex_size * 0.3)}pt}}</style>\n'
+            f'<defs>{hexagons}</defs>\n<rect width="100%" height="100%" fill="#fff"/>\n')
+
+def export_svg(board, path, hex_size=DEFAULT_EXPORT_HEX_SIZE, progress=None):
+    """
+    Writes the board as one SVG, streamed SVG_CHUNK_TILES board tiles at a time, so memory stays at one chunk.
+    Every hexagon is a <use> of a per resource polygon, colors come from RESOURCE_COLORS and harbor labels
+    from HARBOR_SYMBOLS like on screen. No Qt is needed. progress(fraction) follows every chunk,
+    if it raises the partial file is removed.
+    """
+    width, height = board_pixel_size(board, hex_size)
+    num_tiles = board.template.num_tiles if board.template is not None else 0
+    # opened outside the try, a file that could not be created is not removed
+    out = open(path, "w", encoding="utf-8")
+    try:
+        with out:
+            out.write(_svg_header(board, hex_size, width, height))
+            for start in range(0, num_tiles, SVG_CHUNK_TILES):
+                stop = min(start + SVG_CHUNK_TILES, num_tiles)
+                centers = np.round(board.template.unit_centers[start:stop] * hex_size, 2).tolist()
+                chunk = []
+                for index, (x, y) in enumerate(centers, start):
+                    chunk.append(f'<use xlink:href="#{RESOURCE_TYPES[board.resources[index]]}" x="{x}" y="{y}"/>')
+                    number = board.numbers[index]
+                    if number != NO_NUMBER:
+                        chunk.append(f'<text class="n{" r" if number in RED_NUMBERS else ""}" x="{x}" y="{y}">{number}</text>')
+                    if board.harbors[index]:
+                        chunk.append(f'<text class="h" x="{x}" y="{y}">{HARBOR_SYMBOLS[HARBOR_TYPES[board.harbors[index]]]}</text>')
+                chunk.append("\n")
+                out.write("".join(chunk))
+                if progress is not None:
+                    progress(stop / num_tiles)
+            out.write("</svg>\n")
+    except BaseException:
+        os.remove(path)
+        raise
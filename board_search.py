@@ -0,0 +1,226 @@
+import time
+import random
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from globals import RED_NUMBERS
+from board_engine import BoardGenerator, GenerationCancelled
+from board_store import WATER, DESERT, HARBOR_CODES
+from board_archive import encode_board, decode_board
+from intersections import board_vertex_scores
+
+# ====== Metrics                   ==============================================
+# Every metric takes a Board and returns a number, lower is fairer. Metrics must be module level
+# functions when the search runs in a process pool.
+def _directed_edges(template):
+    """(tile, neighbor) index arrays with one entry per direction of every adjacency"""
+    start = np.frombuffer(template.neighbor_start, dtype=np.int32)
+    neighbors = np.frombuffer(template.neighbor_list, dtype=np.int32)
+    return np.repeat(np.arange(template.num_tiles), np.diff(start)), neighbors
+
+def clump_score(board):
+    """Sum of BoardGenerator.get_clump_score over every tile, in one vectorized pass"""
+    tiles, neighbors = _directed_edges(board.template)
+    resources = np.frombuffer(board.resources, dtype=np.int8)
+    productive = (resources != WATER) & (resources != DESERT)
+    return int(np.count_nonzero(productive[tiles] & (resources[tiles] == resources[neighbors])))
+
+def red_adjacency(board):
+    """Neighboring pairs of red numbers, NumberPlacer only leaves these when it ran out of budget"""
+    tiles, neighbors = _directed_edges(board.template)
+    red = np.isin(np.frombuffer(board.numbers, dtype=np.int8), RED_NUMBERS)
+    return int(np.count_nonzero(red[tiles] & red[neighbors] & (tiles < neighbors)))
+
+def pip_variance(board):
+    """Variance of the pips around every settlement spot, low when production is spread evenly"""
+    _, vertex_pips, _ = board_vertex_scores(board)
+    return float(vertex_pips.var()) if len(vertex_pips) else 0.0
+
+def harbor_spread(board):
+    """Consecutive harbors along the coast that trade the same resource, generic harbors are not counted"""
+    harbors = [board.harbors[index] for index, _ in board.template.harbor_slots if board.harbors[index]]
+    if len(harbors) < 2: return 0
+    generic = HARBOR_CODES["generic"]
+    return sum(1 for previous, harbor in zip(harbors[-1:] + harbors[:-1], harbors) if harbor != generic and harbor == previous)
+
+METRICS = {
+    "clump": clump_score,
+    "red_adjacency": red_adjacency,
+    "pip_variance": pip_variance,
+    "harbor_spread": harbor_spread,
+}
+DEFAULT_WEIGHTS = {"clump": 1.0, "red_adjacency": 10.0, "pip_variance": 1.0, "harbor_spread": 1.0}
+
+def score_board(board, weights=None, metrics=None):
+    """(weighted total, {metric: value}) for the metrics with a weight, METRICS and DEFAULT_WEIGHTS by default"""
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    metrics = METRICS if metrics is None else metrics
+    values = {name: metrics[name](board) for name, weight in weights.items() if weight}
+    return sum(weights[name] * value for name, value in values.items()), values
+
+# ====== Pool workers              ==============================================
+# Seconds between checks for a cancel while waiting on the workers
+POLL_INTERVAL = 0.1
+
+_worker_generator = None
+_worker_stopped = None
+_worker_search = 0
+
+def _init_worker(generator_options, stopped):
+    global _worker_generator, _worker_stopped
+    _worker_generator = BoardGenerator(**generator_options)
+    _worker_stopped = stopped
+
+def _check_stop(stage, fraction):
+    if _worker_search <= _worker_stopped.value:
+        raise GenerationCancelled()
+
+def _generate_candidate(job):
+    """
+    Scores one candidate in a worker, the board travels back as an archive record.
+    Returns None when its search stopped while the candidate was being generated.
+    """
+    global _worker_search
+    search_id, resource_counts, seed, weights, metrics = job
+    _worker_search = search_id
+    try:
+        board = _worker_generator.generate(resource_counts, progress=_check_stop, seed=seed)
+    except GenerationCancelled:
+        return None
+    score, values = score_board(board, weights, metrics)
+    return score, values, encode_board(board)
+
+class SearchPool:
+    """
+    Worker processes for BoardSearch that can outlive one search, so a GUI pays the process start up once.
+    Every search gets a rising id and stopping a search marks every id up to it as stopped in a shared value,
+    its candidates still running give up at their next progress report while a newer search keeps going.
+    A pool broken by a dead worker gets new processes through restart(). close() shuts the processes down.
+    """
+    def __init__(self, processes, generator_options=None, mp_context=None):
+        self.processes = processes
+        self.generator_options = dict(generator_options or {})
+        self.mp_context = mp_context
+        self.stopped = (mp_context or multiprocessing).Value("q", 0)
+        self._ids = itertools.count(1)
+        self.executor = self.new_executor()
+
+    def new_executor(self):
+        return ProcessPoolExecutor(self.processes, mp_context=self.mp_context, initializer=_init_worker,
+                                   initargs=(self.generator_options, self.stopped))
+
+    def restart(self, executor):
+        """Replaces executor after it broke, only when it still is the current one so it is replaced once"""
+        if executor is self.executor:
+            self.executor = self.new_executor()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def new_search(self): return next(self._ids)
+
+    def stop(self, search_id, futures):
+        """Cancels futures that have not started and waits for the running ones to give up"""
+        with self.stopped.get_lock():
+            self.stopped.value = max(self.stopped.value, search_id)
+        for future in futures: future.cancel()
+        wait(futures)
+
+    def close(self):
+        with self.stopped.get_lock():
+            self.stopped.value = 2**62
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc_info): self.close()
+
+# ====== BoardSearch               ==============================================
+class BoardSearch:
+    """
+    Best of K: generates up to candidates boards from consecutive seeds and keeps the lowest weighted score.
+    Stops early once a board scores at or below threshold, or when time_budget seconds have passed
+    (the best board so far is returned, at least one board is always waited for).
+    processes > 1 spreads the candidates over a SearchPool made for the run, or over pool when one is given
+    (its generator options are used then). Candidates still running when the search stops are abandoned and
+    no worker is busy any more once run() returns. mp_context is handed to the pool, a GUI should pass a "spawn" context.
+    After run(), best_score, best_values and evaluated describe the search.
+    """
+    def __init__(self, candidates=8, processes=1, threshold=None, time_budget=None, weights=None, metrics=None,
+                 generator_options=None, mp_context=None, pool=None):
+        self.candidates = max(1, candidates)
+        self.processes = processes
+        self.threshold = threshold
+        self.time_budget = time_budget
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.metrics = dict(METRICS if metrics is None else metrics)
+        self.generator_options = dict(generator_options or {})
+        self.mp_context = mp_context
+        self.pool = pool
+        self.best_score, self.best_values, self.best_board, self.evaluated = None, None, None, 0
+
+    def _consider(self, score, values, board):
+        self.evaluated += 1
+        if self.best_score is None or score < self.best_score:
+            self.best_score, self.best_values, self.best_board = score, values, board
+
+    def _done(self, deadline):
+        if self.threshold is not None and self.best_score is not None and self.best_score <= self.threshold:
+            return True
+        # the deadline only counts once there is a board to return
+        return deadline is not None and self.best_board is not None and time.perf_counter() > deadline
+
+    def run(self, resource_counts, seed=None, progress=None):
+        """
+        Returns the best board, candidate i is generated from seed + i so any of them can be regenerated.
+        progress(stage, fraction) is called after every candidate and every POLL_INTERVAL while waiting on
+        the pool, raising from it stops the search. When a worker process dies the pool is restarted and
+        BrokenProcessPool is raised, the next run works again.
+        """
+        report = progress if progress is not None else lambda stage, fraction: None
+        if seed is None:
+            seed = random.SystemRandom().randrange(2**62)
+        deadline = time.perf_counter() + self.time_budget if self.time_budget is not None else None
+        self.best_score, self.best_values, self.best_board, self.evaluated = None, None, None, 0
+        seeds = range(seed, seed + self.candidates)
+        report("searching boards", 0.0)
+
+        if self.pool is None and self.processes <= 1:
+            generator = BoardGenerator(**self.generator_options)
+            for candidate_seed in seeds:
+                board = generator.generate(resource_counts, seed=candidate_seed)
+                self._consider(*score_board(board, self.weights, self.metrics), board)
+                report("searching boards", self.evaluated / self.candidates)
+                if self._done(deadline): break
+            return self.best_board
+
+        pool = self.pool if self.pool is not None else SearchPool(self.processes, self.generator_options, self.mp_context)
+        search_id, pending, executor = pool.new_search(), set(), pool.executor
+        try:
+            pending = {executor.submit(_generate_candidate, (search_id, resource_counts, candidate_seed, self.weights, self.metrics))
+                       for candidate_seed in seeds}
+            while pending:
+                timeout = POLL_INTERVAL
+                if deadline is not None and self.evaluated:
+                    timeout = min(timeout, max(0.0, deadline - time.perf_counter()))
+                finished, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    if result is None: continue
+                    score, values, record = result
+                    # only the best board is decoded
+                    if self.best_score is None or score < self.best_score:
+                        self._consider(score, values, decode_board(record))
+                    else:
+                        self.evaluated += 1
+                report("searching boards", self.evaluated / self.candidates)
+                if self._done(deadline): break
+        except BrokenProcessPool:
+            pool.restart(executor)
+            raise
+        finally:
+            if pending: pool.stop(search_id, pending)
+            if pool is not self.pool: pool.close()
+        return self.best_board
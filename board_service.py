@@ -0,0 +1,280 @@
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import ipaddress
+from collections import deque
+from urllib.parse import urlsplit, parse_qsl
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Only the Qt free engine is used here, like board_cli
+from globals import LAND_RESOURCES, LAND_RESOURCE_RATIOS
+from batch import init_worker, generate_encoded_board
+
+DEFAULT_PORT = 8765
+# Boards kept ready per pooled configuration
+DEFAULT_POOL_SIZE = 8
+# Base game sets that get a pool when nothing else is configured
+DEFAULT_POOL_SETS = (1, 2, 4)
+# Largest board generated on request, bigger ones are refused with 400
+DEFAULT_MAX_TILES = 20000
+MAX_BODY_BYTES = 1 << 16
+# Latencies kept for the percentiles of /metrics
+LATENCY_WINDOW = 4096
+# Seconds a refill task waits after a failed generation before it tries again
+REFILL_RETRY_DELAY = 1.0
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+def encode_json(board):
+    """A board as the json bytes the service answers with, made in the worker so a pool hit only writes bytes"""
+    return json.dumps(board.to_dict(), separators=(",", ":")).encode()
+
+def counts_for_sets(sets): return {res: LAND_RESOURCE_RATIOS[res] * sets for res in LAND_RESOURCES}
+
+def config_key(resource_counts): return tuple(resource_counts[res] for res in LAND_RESOURCES)
+
+def is_loopback(host):
+    """True for a loopback address, or a name like localhost that only resolves to loopback addresses"""
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        pass
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except socket.gaierror:
+        return False
+    return bool(addresses) and all(ipaddress.ip_address(address).is_loopback for address in addresses)
+
+class BadRequest(Exception):
+    pass
+
+def parse_board_request(query, body):
+    """
+    (resource counts, seed) from the query string and the json body of a board request, the body wins.
+    "sets" scales the base game ratios, a count per resource name overrides one resource.
+    """
+    params = dict(query)
+    if body:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise BadRequest("body is not json")
+        if not isinstance(data, dict):
+            raise BadRequest("body must be a json object")
+        resource_counts = data.pop("resource_counts", None) or {}
+        if not isinstance(resource_counts, dict):
+            raise BadRequest("resource_counts must be a json object")
+        params.update(resource_counts)
+        params.update(data)
+    try:
+        counts = counts_for_sets(int(params.get("sets", 1)))
+        for res in LAND_RESOURCES:
+            if params.get(res) is not None: counts[res] = int(params[res])
+        seed = int(params["seed"]) if params.get("seed") is not None else None
+    except (TypeError, ValueError):
+        raise BadRequest("sets, seed and resource counts must be integers")
+    if any(count < 0 for count in counts.values()):
+        raise BadRequest("resource counts can not be negative")
+    return counts, seed
+
+# ====== BoardService              ==============================================
+class BoardService:
+    """
+    Boards over HTTP/JSON on localhost, stdlib only.
+    - GET /board?sets=2&sheep=9&seed=5 or POST /board with {"sets": 2, "resource_counts": {...}, "seed": 5}
+    - GET /metrics: request counts, pool hits and misses, latency percentiles and the pool levels
+    - GET /health
+    Every pooled configuration keeps up to pool_size boards ready, refilled by tasks that run the generator in
+    a process pool, so unseeded requests for them are answered straight from memory. Seeded requests and
+    other configurations are generated on demand in the same pool (a seed always gives its own board).
+    """
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, processes=2, pool_size=DEFAULT_POOL_SIZE,
+                 pool_configs=None, max_tiles=DEFAULT_MAX_TILES, generator_options=None):
+        if not is_loopback(host):
+            raise ValueError(f"the board service only listens on localhost, not {host}")
+        self.host, self.port = host, port
+        self.processes = max(1, processes)
+        self.pool_size = pool_size
+        self.pool_configs = [dict(counts) for counts in (pool_configs if pool_configs is not None
+                                                          else map(counts_for_sets, DEFAULT_POOL_SETS))]
+        self.max_tiles = max_tiles
+        self.generator_options = dict(generator_options or {})
+        self.pools, self.tasks, self.executor, self.server = {}, [], None, None
+        self.started = time.time()
+        self.counters = {"requests": 0, "boards": 0, "pool_hits": 0, "pool_misses": 0, "errors": 0, "generated": 0,
+                         "refill_errors": 0, "pool_restarts": 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    # ---- generation -------------------------------------------------------------
+    def new_executor(self):
+        return ProcessPoolExecutor(self.processes, initializer=init_worker, initargs=(self.generator_options, encode_json))
+
+    async def generate(self, resource_counts, seed=None):
+        """
+        One board as json bytes from the worker processes. A broken pool (a worker died) is replaced once,
+        by whichever call notices first, and the error is raised so the caller can retry.
+        """
+        loop, executor = asyncio.get_running_loop(), self.executor
+        try:
+            board = await loop.run_in_executor(executor, generate_encoded_board, (resource_counts, seed))
+        except BrokenProcessPool:
+            if executor is self.executor:
+                self.counters["pool_restarts"] += 1
+                self.executor = self.new_executor()
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        self.counters["generated"] += 1
+        return board
+
+    async def refill(self, resource_counts, pool):
+        """
+        Keeps pool full, put() waits while it is, so a pool never holds more than pool_size boards.
+        A failed generation is counted in refill_errors and tried again after REFILL_RETRY_DELAY.
+        """
+        while True:
+            try:
+                board = await self.generate(resource_counts)
+            except Exception:
+                self.counters["refill_errors"] += 1
+                await asyncio.sleep(REFILL_RETRY_DELAY)
+                continue
+            await pool.put(board)
+
+    async def board(self, resource_counts, seed=None):
+        """(json bytes, served from the pool)"""
+        pool = self.pools.get(config_key(resource_counts)) if seed is None else None
+        if pool is not None and not pool.empty():
+            self.counters["pool_hits"] += 1
+            return pool.get_nowait(), True
+        self.counters["pool_misses"] += 1
+        return await self.generate(resource_counts, seed), False
+
+    # ---- http -------------------------------------------------------------------
+    def metrics(self):
+        latencies = sorted(self.latencies)
+        def percentile(p): return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 3) if latencies else None
+        lookups = self.counters["pool_hits"] + self.counters["pool_misses"]
+        return dict(self.counters,
+                    uptime=round(time.time() - self.started, 1),
+                    pool_hit_rate=round(self.counters["pool_hits"] / lookups, 4) if lookups else None,
+                    latency_ms={"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99),
+                                "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None},
+                    pools=[{"resource_counts": dict(zip(LAND_RESOURCES, key)), "ready": pool.qsize(), "size": self.pool_size}
+                           for key, pool in self.pools.items()])
+
+    async def respond(self, method, target, body):
+        """(status, json bytes) of one request"""
+        url = urlsplit(target)
+        if url.path == "/health" and method == "GET":
+            return 200, b'{"status":"ok"}'
+        if url.path == "/metrics" and method == "GET":
+            return 200, json.dumps(self.metrics()).encode()
+        if url.path != "/board":
+            return 404, b'{"error":"not found"}'
+        if method not in ("GET", "POST"):
+            return 405, b'{"error":"use GET or POST"}'
+        resource_counts, seed = parse_board_request(parse_qsl(url.query), body)
+        if sum(resource_counts.values()) > self.max_tiles:
+            raise BadRequest(f"boards are limited to {self.max_tiles} land tiles")
+        self.counters["boards"] += 1
+        board, _ = await self.board(resource_counts, seed)
+        return 200, board
+
+    async def handle(self, reader, writer):
+        """One connection, requests are answered in order until the client closes or stops keeping alive"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                started = time.perf_counter()
+                method, target, version = (request_line.decode("latin-1").split() + ["", "", ""])[:3]
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""): break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                self.counters["requests"] += 1
+                try:
+                    length = int(headers.get("content-length", 0))
+                    if not 0 <= length <= MAX_BODY_BYTES:
+                        raise BadRequest("body too large")
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self.respond(method, target, body)
+                except BadRequest as error:
+                    status, payload = 400, json.dumps({"error": str(error)}).encode()
+                except Exception as error:
+                    # a failed board must not take the connection, or the service, down with it
+                    status, payload = 500, json.dumps({"error": str(error)}).encode()
+                if status >= 400:
+                    self.counters["errors"] += 1
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(f"{version or 'HTTP/1.1'} {status} {HTTP_REASONS.get(status, '')}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload)
+                await writer.drain()
+                self.latencies.append(time.perf_counter() - started)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # ---- lifetime ---------------------------------------------------------------
+    async def start(self):
+        """Starts the worker processes, the refill tasks and the listening socket"""
+        self.executor = self.new_executor()
+        for resource_counts in self.pool_configs:
+            pool = self.pools.setdefault(config_key(resource_counts), asyncio.Queue(self.pool_size))
+            # one refill task per worker process so a drained pool is refilled in parallel
+            for _ in range(min(self.processes, self.pool_size)):
+                self.tasks.append(asyncio.create_task(self.refill(resource_counts, pool)))
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        for task in self.tasks: task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"serving boards on http://{self.host}:{self.port}", flush=True)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve MegaCatan boards as json over HTTP on localhost.")
+    parser.add_argument("--host", default="127.0.0.1", help="loopback address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-p", "--processes", type=int, default=2, help="worker processes generating boards")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE, help="boards kept ready per pooled configuration")
+    parser.add_argument("--pool-sets", type=int, nargs="*", default=list(DEFAULT_POOL_SETS),
+                        help="base game set counts that get a pool of ready boards")
+    parser.add_argument("--max-tiles", type=int, default=DEFAULT_MAX_TILES, help="largest board served")
+    args = parser.parse_args(argv)
+    try:
+        service = BoardService(args.host, args.port, args.processes, args.pool_size,
+                               [counts_for_sets(sets) for sets in args.pool_sets], args.max_tiles)
+    except ValueError as error:
+        parser.error(str(error))
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import numpy as np
+
+from globals import RED_NUMBERS
+from board_store import RESOURCE_TYPES, WATER, DESERT, NO_NUMBER, is_productive
+from board_search import clump_score, red_adjacency
+
+# ====== BoardStats                ==============================================
+class BoardStats:
+    """
+    Counts shown next to a board, kept current while tiles are edited by hand.
+    Computed once over the whole board, after that every edit only looks at the edited tile's neighbors:
+    - clump: sum of BoardGenerator.get_clump_score over every tile
+    - red_conflicts: neighboring pairs of red numbers
+    - resource_counts, land_tiles, water_tiles, harbors
+    """
+    def __init__(self, board):
+        self.board = board
+        template = board.template
+        counts = np.bincount(np.frombuffer(board.resources, dtype=np.int8), minlength=len(RESOURCE_TYPES)) if template is not None else []
+        self.resource_counts = {resource: int(count) for resource, count in zip(RESOURCE_TYPES, counts) if resource != "water"}
+        self.water_tiles = int(counts[WATER]) if template is not None else 0
+        self.land_tiles = len(board.resources) - self.water_tiles
+        self.harbors = sum(board.harbor_counts.values())
+        self.clump = clump_score(board) if template is not None else 0
+        self.red_conflicts = red_adjacency(board) if template is not None else 0
+
+    def _around(self, index):
+        """(clump, red conflicts) that involve tile index"""
+        board = self.board
+        resource, number = board.resources[index], board.numbers[index]
+        same = red = 0
+        for neighbor in board.template.neighbors_of(index):
+            if is_productive(resource) and board.resources[neighbor] == resource: same += 1
+            if number in RED_NUMBERS and board.numbers[neighbor] in RED_NUMBERS: red += 1
+        # a same resource pair adds one to the clump score of both tiles
+        return 2 * same, red
+
+    def edit(self, index, resource_type, number):
+        """
+        Sets the resource and number of a land tile and updates the counts in O(degree).
+        number is None for no token, deserts never keep one.
+        """
+        board = self.board
+        if board.resources[index] == WATER or resource_type == "water":
+            raise ValueError("only land tiles can be edited")
+        code = RESOURCE_TYPES.index(resource_type)
+        number = NO_NUMBER if number is None or code == DESERT else number
+        clump, red = self._around(index)
+        self.resource_counts[RESOURCE_TYPES[board.resources[index]]] -= 1
+        board.resources[index], board.numbers[index] = code, number
+        self.resource_counts[resource_type] += 1
+        new_clump, new_red = self._around(index)
+        self.clump += new_clump - clump
+        self.red_conflicts += new_red - red
+
+    def swap(self, i, j):
+        """Swaps the resources and numbers of two land tiles, as two single tile edits"""
+        board = self.board
+        resource_i, number_i = RESOURCE_TYPES[board.resources[i]], board.numbers[i]
+        resource_j, number_j = RESOURCE_TYPES[board.resources[j]], board.numbers[j]
+        self.edit(i, resource_j, number_j or None)
+        self.edit(j, resource_i, number_i or None)
@@ -0,0 +1,164 @@
+from array import array
+from collections.abc import Mapping
+
+from globals import LAND_RESOURCES, HARBOR_SYMBOLS
+
+# ====== Small integer codes       ==============================================
+# Resources and harbors are stored as one byte each, the code is the position in these lists.
+RESOURCE_TYPES = ["water"] + LAND_RESOURCES
+RESOURCE_CODES = {resource: code for code, resource in enumerate(RESOURCE_TYPES)}
+WATER = RESOURCE_CODES["water"]
+DESERT = RESOURCE_CODES["desert"]
+
+HARBOR_TYPES = [None] + list(HARBOR_SYMBOLS)
+HARBOR_CODES = {harbor: code for code, harbor in enumerate(HARBOR_TYPES)}
+
+NO_NUMBER = 0
+NO_ORIENTATION = -1
+
+def is_productive(code): return code != WATER and code != DESERT
+
+# ====== Tile class                ==============================================
+class Tile:
+    """
+    Defines a tile both graphically and under the hood.
+    Tile can be a:
+    - Resource - (i.e sheep, ore) which utilizes the number token and resource type,
+    - Water - could be a harbor which will track its harbor type.
+    All tiles carry geometric information where the hexagon can be "pointy" (axial) or "flat" (row/col)
+    A Tile is only a view of one index of a Board's arrays, reading or setting its attributes goes
+    straight to the arrays, so views are cheap to make and throw away.
+    """
+    __slots__ = ("board", "index")
+
+    def __init__(self, board, index):
+        self.board, self.index = board, index
+
+    def __eq__(self, other):
+        return isinstance(other, Tile) and self.board is other.board and self.index == other.index
+
+    def __hash__(self): return hash((id(self.board), self.index))
+
+    def __repr__(self):
+        return f"Tile({self.r}, {self.c}, {self.resource_type!r}, number={self.number}, harbor={self.harbor_type!r})"
+
+    @property
+    def r(self): return self.board.template.rows[self.index]
+
+    @property
+    def c(self): return self.board.template.cols[self.index]
+
+    @property
+    def resource_type(self): return RESOURCE_TYPES[self.board.resources[self.index]]
+
+    @resource_type.setter
+    def resource_type(self, resource_type): self.board.resources[self.index] = RESOURCE_CODES[resource_type]
+
+    @property
+    def number(self):
+        number = self.board.numbers[self.index]
+        return None if number == NO_NUMBER else number
+
+    @number.setter
+    def number(self, number): self.board.numbers[self.index] = NO_NUMBER if number is None else number
+
+    @property
+    def harbor_type(self): return HARBOR_TYPES[self.board.harbors[self.index]]
+
+    @harbor_type.setter
+    def harbor_type(self, harbor_type): self.board.harbors[self.index] = HARBOR_CODES[harbor_type]
+
+    @property
+    def harbor_orientation(self):
+        orientation = self.board.harbor_orientations[self.index]
+        return None if orientation == NO_ORIENTATION else orientation
+
+    @harbor_orientation.setter
+    def harbor_orientation(self, orientation):
+        self.board.harbor_orientations[self.index] = NO_ORIENTATION if orientation is None else orientation
+
+# ====== BoardGridMap              ==============================================
+class BoardGridMap(Mapping):
+    """Read only {(r, c): Tile} view of a board, lookups go through the template's dense index"""
+    def __init__(self, board): self.board = board
+
+    def __getitem__(self, coord):
+        index = self.board.index_of(*coord)
+        if index < 0: raise KeyError(coord)
+        return Tile(self.board, index)
+
+    def __contains__(self, coord): return self.board.index_of(*coord) >= 0
+
+    def __iter__(self):
+        template = self.board.template
+        if template is None: return iter(())
+        return zip(template.rows, template.cols)
+
+    def __len__(self): return len(self.board.resources)
+
+# ====== Board class               ==============================================
+class Board:
+    """
+    The result of one generation, stored as one typed array per attribute in template order
+    (water tiles first, then land): resource codes, numbers, harbor codes and harbor orientations.
+    Coordinates and adjacency live in the shared template, see topology.BoardTemplate.
+    """
+    def __init__(self, template=None, orientation="pointy", board_shape="", core_rows=0, core_cols=0, harbor_counts=None, seed=None):
+        self.seed = seed
+        self.template = template
+        self.orientation = orientation
+        self.board_shape = board_shape
+        self.core_rows, self.core_cols = core_rows, core_cols
+        self.harbor_counts = harbor_counts if harbor_counts is not None else {}
+
+        num_tiles = template.num_tiles if template is not None else 0
+        self.resources = array('b', [WATER]) * num_tiles
+        self.numbers = array('b', [NO_NUMBER]) * num_tiles
+        self.harbors = array('b', [0]) * num_tiles
+        self.harbor_orientations = array('b', [NO_ORIENTATION]) * num_tiles
+
+    def copy(self):
+        """Snapshot with its own arrays, the template is shared"""
+        board = Board(None, self.orientation, self.board_shape, self.core_rows, self.core_cols, dict(self.harbor_counts), self.seed)
+        board.template = self.template
+        board.resources, board.numbers = array('b', self.resources), array('b', self.numbers)
+        board.harbors, board.harbor_orientations = array('b', self.harbors), array('b', self.harbor_orientations)
+        return board
+
+    def index_of(self, r, c):
+        """Position of (r, c) in the arrays, -1 when it is not on the board"""
+        return self.template.index_of(r, c) if self.template is not None else -1
+
+    def tile(self, index): return Tile(self, index)
+
+    def tile_at(self, r, c):
+        index = self.index_of(r, c)
+        return Tile(self, index) if index >= 0 else None
+
+    @property
+    def tiles(self): return [Tile(self, index) for index in range(len(self.resources))]
+
+    @property
+    def grid_map(self): return BoardGridMap(self)
+
+    def productive_indices(self):
+        return [index for index, code in enumerate(self.resources) if is_productive(code)]
+
+    def to_dict(self):
+        """Plain data form of the board, used by the command line and anything that wants json."""
+        template = self.template
+        tiles = []
+        if template is not None:
+            for index, (r, c) in enumerate(zip(template.rows, template.cols)):
+                number, orientation = self.numbers[index], self.harbor_orientations[index]
+                tiles.append([r, c, RESOURCE_TYPES[self.resources[index]], None if number == NO_NUMBER else number,
+                              HARBOR_TYPES[self.harbors[index]], None if orientation == NO_ORIENTATION else orientation])
+        return {
+            "seed": self.seed,
+            "shape": self.board_shape,
+            "orientation": self.orientation,
+            "core_rows": self.core_rows,
+            "core_cols": self.core_cols,
+            "harbor_counts": self.harbor_counts,
+            "tiles": tiles,
+        }
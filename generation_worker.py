@@ -0,0 +1,79 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from board_engine import BoardGenerator, GenerationCancelled
+from board_export import ExportCancelled, export_svg, export_png_tiles
+
+# ====== GenerationWorker(QThread) ==============================================
+class GenerationWorker(QThread):
+    """
+    Runs one board generation off the GUI thread, or a best of K board_search.BoardSearch when search is given.
+    Emits progress(percent, stage) while working and board_ready(board) when done.
+    cancel() makes the generation stop at its next progress report, a cancelled worker never emits board_ready.
+    Once finished, error holds the message of an exception that stopped the generation.
+    """
+    progress = pyqtSignal(int, str)
+    board_ready = pyqtSignal(object)
+
+    def __init__(self, resource_counts, generator=None, parent=None, search=None):
+        super().__init__(parent)
+        self.resource_counts = dict(resource_counts)
+        self.generator = generator if generator is not None else BoardGenerator()
+        self.search = search
+        self.error = None
+        self._cancelled = False
+
+    def cancel(self): self._cancelled = True
+
+    def _report(self, stage, fraction):
+        if self._cancelled:
+            raise GenerationCancelled()
+        self.progress.emit(int(fraction * 100), stage)
+
+    def run(self):
+        try:
+            if self.search is not None:
+                board = self.search.run(self.resource_counts, progress=self._report)
+            else:
+                board = self.generator.generate(self.resource_counts, progress=self._report)
+        except GenerationCancelled:
+            return
+        except Exception as error:
+            # a dead search worker, a mask too small, ... ends the thread without a board either way
+            self.error = str(error) or type(error).__name__
+            return
+        if not self._cancelled:
+            self.board_ready.emit(board)
+
+# ====== ExportWorker(QThread)     ==============================================
+class ExportWorker(QThread):
+    """
+    Writes a board as one SVG (svg=True) or as a folder of PNG tiles off the GUI thread.
+    Emits progress(percent, stage) while writing. Once finished, written tells whether the export completed and
+    error holds the OSError message when the files could not be written.
+    cancel() stops the export at its next progress report and removes what it wrote.
+    """
+    progress = pyqtSignal(int, str)
+
+    def __init__(self, board, path, svg=True, parent=None):
+        super().__init__(parent)
+        self.board, self.path, self.svg = board, path, svg
+        self.written, self.error = False, None
+        self._cancelled = False
+
+    def cancel(self): self._cancelled = True
+
+    def _report(self, fraction):
+        if self._cancelled:
+            raise ExportCancelled()
+        self.progress.emit(int(fraction * 100), "exporting")
+
+    def run(self):
+        try:
+            if self.svg: export_svg(self.board, self.path, progress=self._report)
+            else: export_png_tiles(self.board, self.path, progress=self._report)
+        except ExportCancelled:
+            return
+        except OSError as error:
+            self.error = str(error)
+            return
+        self.written = True
@@ -0,0 +1,75 @@
+import numpy as np
+
+# ====== Unit hexagon geometry     ==============================================
+# Everything here is for a hex size of 1, pixel positions are a single multiply by hex_size away.
+SQRT3 = np.sqrt(3.0)
+
+def unit_centers(coords, orientation):
+    """
+    Hexagon centers for every (r, c) in coords in one vectorized pass, as an (N, 2) array.
+    Shifted so the board starts one hex in from the corner.
+    """
+    if not coords:
+        return np.zeros((0, 2))
+    rc = np.asarray(coords, dtype=np.float64)
+    r, c = rc[:, 0], rc[:, 1]
+    if orientation == 'flat':
+        x = c * 1.5
+        y = r * SQRT3 + (c % 2) * (SQRT3 / 2)
+    else:
+        x = SQRT3 * (c + r / 2.0)
+        y = 1.5 * r
+    centers = np.column_stack((x, y))
+    centers -= centers.min(axis=0) - 1
+    return centers
+
+def hexagon_corners(orientation):
+    """The six corners of a unit hexagon around (0, 0), flat hexagons start at 0 degrees, pointy at 30"""
+    angle_offset = 0 if orientation == 'flat' else 30
+    angles = np.radians(np.arange(0, 360, 60) + angle_offset)
+    return np.column_stack((np.cos(angles), np.sin(angles)))
+
+# ====== HexSpatialIndex           ==============================================
+class HexSpatialIndex:
+    """
+    Uniform grid over the unit hexagon centers so a view only touches the tiles it intersects.
+    Built once per board template, queries work in unit coordinates (divide pixels by hex_size).
+    """
+    def __init__(self, centers, cell_size=4.0):
+        self.centers = centers
+        self.cell_size = cell_size
+        self.buckets = {}
+        if not len(centers):
+            return
+        cells = np.floor(centers / cell_size).astype(np.int64)
+        order = np.lexsort((cells[:, 1], cells[:, 0]))
+        sorted_cells = cells[order]
+        starts = np.flatnonzero(np.any(np.diff(sorted_cells, axis=0), axis=1)) + 1
+        for group in np.split(order, starts):
+            cx, cy = cells[group[0]]
+            self.buckets[(int(cx), int(cy))] = group
+
+    def query(self, x0, y0, x1, y1):
+        """Indices of the tiles whose hexagon can overlap the unit rectangle (x0, y0)-(x1, y1)"""
+        # a hexagon reaches one unit past its center
+        cx0, cy0 = int(np.floor((x0 - 1) / self.cell_size)), int(np.floor((y0 - 1) / self.cell_size))
+        cx1, cy1 = int(np.floor((x1 + 1) / self.cell_size)), int(np.floor((y1 + 1) / self.cell_size))
+        groups = [self.buckets[(cx, cy)] for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)
+                  if (cx, cy) in self.buckets]
+        if not groups:
+            return np.zeros(0, dtype=np.int64)
+        indices = np.concatenate(groups)
+        return np.sort(indices)
+
+    def nearest(self, x, y):
+        """
+        Index of the tile whose hexagon contains the unit point (x, y), -1 off the board.
+        Hexagons tile the plane, so the containing one is the one with the nearest center.
+        """
+        candidates = self.query(x, y, x, y)
+        if not len(candidates):
+            return -1
+        distances = ((self.centers[candidates] - (x, y)) ** 2).sum(axis=1)
+        best = int(np.argmin(distances))
+        # farther than a corner from the nearest center is off the board
+        return int(candidates[best]) if distances[best] <= 1.0 else -1
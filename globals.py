@@ -1,15 +1,14 @@
-from PyQt6.QtGui import QColor
-
 # All default values come from the classic base game of catan.
+# Colors are plain (r, g, b) tuples so the tables can be loaded without PyQt6.
 
 RESOURCE_COLORS = {
-    "water" : QColor(64, 164, 223),
-    "desert": QColor(0, 0, 0),
-    "wood"  : QColor(34, 139, 34),
-    "brick" : QColor(232, 87, 9),
-    "wheat" : QColor(240, 230, 140),
-    "ore"   : QColor(150, 150, 150),
-    "sheep" : QColor(255, 255, 255),
+    "water" : (64, 164, 223),
+    "desert": (0, 0, 0),
+    "wood"  : (34, 139, 34),
+    "brick" : (232, 87, 9),
+    "wheat" : (240, 230, 140),
+    "ore"   : (150, 150, 150),
+    "sheep" : (255, 255, 255),
 }
 
 LAND_RESOURCES = ["sheep",
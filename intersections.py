@@ -0,0 +1,84 @@
+from functools import lru_cache
+
+import numpy as np
+
+from globals import LAND_RESOURCES
+from geometry import hexagon_corners
+from number_placement import PIPS
+from topology import TEMPLATE_CACHE_SIZE
+from board_store import RESOURCE_TYPES
+
+# Corner positions are matched after rounding to this many decimals of a unit hex
+_VERTEX_DECIMALS = 4
+
+# ====== IntersectionIndex         ==============================================
+class IntersectionIndex:
+    """
+    Every corner (vertex) of the board where a settlement could go, with the tiles around it.
+    Built from the unit hexagon corners in one vectorized pass, works for 'pointy' and 'flat' layouts.
+    - positions: (V, 2) unit coordinates of the vertices
+    - tiles: (V, 3) board indices (template order), -1 where a vertex has fewer than three tiles
+    Only vertices that touch at least one land tile are kept.
+    """
+    def __init__(self, template):
+        centers = template.unit_centers
+        num_tiles = len(centers)
+        if not num_tiles:
+            self.positions, self.tiles = np.zeros((0, 2)), np.full((0, 3), -1, dtype=np.int64)
+            return
+
+        corners = (centers[:, None, :] + hexagon_corners(template.orientation)[None, :, :]).reshape(-1, 2)
+        keys = np.round(corners, _VERTEX_DECIMALS)
+        unique_keys, vertex_of_corner = np.unique(keys, axis=0, return_inverse=True)
+        vertex_of_corner = vertex_of_corner.reshape(-1)
+        tile_of_corner = np.repeat(np.arange(num_tiles), 6)
+
+        # slot each corner's tile into column 0, 1 or 2 of its vertex
+        order = np.argsort(vertex_of_corner, kind='stable')
+        sorted_vertices = vertex_of_corner[order]
+        starts = np.searchsorted(sorted_vertices, sorted_vertices, side='left')
+        slots = np.arange(len(order)) - starts
+        tiles = np.full((len(unique_keys), 3), -1, dtype=np.int64)
+        tiles[sorted_vertices, slots] = tile_of_corner[order]
+
+        is_land = np.zeros(num_tiles + 1, dtype=bool)
+        is_land[template.num_water:num_tiles] = True
+        touches_land = is_land[tiles].any(axis=1)   # -1 lands on the padding entry
+        self.positions = unique_keys[touches_land]
+        self.tiles = tiles[touches_land]
+
+    def __len__(self): return len(self.positions)
+
+    def scores(self, numbers, resource_codes):
+        """
+        Per vertex pip totals and resource diversity in one vectorized pass.
+        numbers holds the token of every tile (0 for none) and resource_codes the LAND_RESOURCES index of
+        every productive tile (-1 for water, desert and no tile), both in template order.
+        """
+        pip_table = np.asarray(PIPS, dtype=np.int64)
+        padded_pips = np.append(pip_table[np.asarray(numbers, dtype=np.int64)], 0)
+        padded_codes = np.append(np.asarray(resource_codes, dtype=np.int64), -1)
+        vertex_pips = padded_pips[self.tiles].sum(axis=1)
+
+        a, b, c = padded_codes[self.tiles].T
+        diversity = ((a >= 0).astype(np.int64) + ((b >= 0) & (b != a)) + ((c >= 0) & (c != a) & (c != b)))
+        return vertex_pips, diversity
+
+def board_arrays(board):
+    """Numbers and resource codes of a board's tiles in template order, as needed by scores()"""
+    # board resource code -> LAND_RESOURCES index, -1 for water and desert
+    productive = np.array([LAND_RESOURCES.index(res) if res in LAND_RESOURCES and res != 'desert' else -1
+                           for res in RESOURCE_TYPES], dtype=np.int64)
+    numbers = np.frombuffer(board.numbers, dtype=np.int8).astype(np.int64)
+    codes = productive[np.frombuffer(board.resources, dtype=np.int8)]
+    return numbers, codes
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def get_intersection_index(template):
+    """Intersection index of a board template, built once like the template itself"""
+    return IntersectionIndex(template)
+
+def board_vertex_scores(board):
+    """(index, pips, diversity) for a generated board"""
+    index = get_intersection_index(board.template)
+    return (index,) + index.scores(*board_arrays(board))
@@ -1,314 +1,324 @@
 import math
-import random
-from PyQt6.QtWidgets import QWidget
-from PyQt6.QtGui import QPainter, QPolygonF, QPen, QBrush, QColor, QFont
-from PyQt6.QtCore import Qt, QPointF
+from PyQt6.QtWidgets import QWidget, QMenu
+from PyQt6.QtGui import QPainter, QPolygonF, QPen, QBrush, QColor, QFont, QPixmap, QImage
+from PyQt6.QtCore import Qt, QPointF, QRect, pyqtSignal
 
-from globals import (RESOURCE_COLORS, NUMBER_RATIOS, 
-                     RED_NUMBERS, HARBOR_SYMBOLS, LAND_RESOURCE_RATIOS, HARBOR_RATIOS)
+import tracing
+from globals import RESOURCE_COLORS, RED_NUMBERS, HARBOR_SYMBOLS, LAND_RESOURCES, NUMBER_RATIOS
+from board_engine import BoardGenerator, get_neighbors
+from board_store import RESOURCE_TYPES, HARBOR_TYPES, NO_NUMBER, WATER, DESERT
+from board_stats import BoardStats
+from geometry import hexagon_corners, HexSpatialIndex
+from intersections import board_vertex_scores
 
-# ====== Tile class                ==============================================
-class Tile:
+HEATMAP_LEVELS = 8
+HEATMAP_METRICS = {"pips": "Pips", "diversity": "Resource diversity"}
+
+RESOURCE_QCOLORS = {resource: QColor(*rgb) for resource, rgb in RESOURCE_COLORS.items()}
+
+# ====== TileSprites               ==============================================
+class TileSprites:
+    """
+    Pre-rendered hexagons for every resource and text for every number and harbor at one hex size.
+    Painting a tile is then one or two pixmap blits instead of new pens, brushes and fonts per tile.
+    Every sprite is a square centered on the hexagon center.
+    images=True makes QImage sprites instead of QPixmaps, those can be drawn off the GUI thread (exports).
+    """
+    def __init__(self, hex_size, orientation, device_pixel_ratio=1.0, images=False):
+        self.hex_size, self.orientation = hex_size, orientation
+        self.device_pixel_ratio = device_pixel_ratio
+        self.images = images
+        self.side = math.ceil(2 * hex_size) + 4
+        self.half = self.side / 2
+        corners = hexagon_corners(orientation).tolist()
+        self.hexagon = QPolygonF([QPointF(self.half + hex_size * dx, self.half + hex_size * dy) for dx, dy in corners])
+        self.number_font = QFont("Arial", int(hex_size*0.5), QFont.Weight.Bold)
+        self.harbor_font = QFont("Arial", int(hex_size*0.3), QFont.Weight.Bold)
+        tracing.count("fonts_created", 2)
+
+        self.tiles = {resource: self._hexagon(color) for resource, color in RESOURCE_QCOLORS.items()}
+        self.unknown_tile = self._hexagon(QColor("gray"))
+        self.numbers = {}
+        self.heat_dots = []
+        self.selection_outline = None
+        self.harbors = {harbor: self._text(symbol, self.harbor_font, QColor("black")) for harbor, symbol in HARBOR_SYMBOLS.items()}
+
+    def _blank(self):
+        side = math.ceil(self.side * self.device_pixel_ratio)
+        pixmap = QImage(side, side, QImage.Format.Format_ARGB32_Premultiplied) if self.images else QPixmap(side, side)
+        pixmap.setDevicePixelRatio(self.device_pixel_ratio)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        tracing.count("sprites_created")
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        return pixmap, painter
+
+    def _hexagon(self, color):
+        pixmap, painter = self._blank()
+        painter.setPen(QPen(QColor(0,0,0), 2))
+        tracing.count("pens_created")
+        painter.setBrush(QBrush(color))
+        painter.drawPolygon(self.hexagon)
+        painter.end()
+        return pixmap
+
+    def _text(self, text, font, color):
+        pixmap, painter = self._blank()
+        painter.setFont(font)
+        painter.setPen(color)
+        painter.drawText(self.hexagon.boundingRect(), Qt.AlignmentFlag.AlignCenter, text)
+        painter.end()
+        return pixmap
+
+    def tile(self, resource_type): return self.tiles.get(resource_type, self.unknown_tile)
+
+    def drawer(self, painter):
+        """painter.drawImage or painter.drawPixmap, whichever fits these sprites"""
+        return painter.drawImage if self.images else painter.drawPixmap
+
+    def heat_dot(self, level):
+        """Dot for a heatmap level, blue for the lowest score to red for the highest"""
+        if not self.heat_dots:
+            radius = self.hex_size * 0.25
+            for i in range(HEATMAP_LEVELS):
+                pixmap, painter = self._blank()
+                painter.setPen(QPen(QColor(0,0,0), 1))
+                tracing.count("pens_created")
+                painter.setBrush(QBrush(QColor.fromHsvF((1 - i / (HEATMAP_LEVELS - 1)) * 2 / 3, 1.0, 1.0)))
+                painter.drawEllipse(QPointF(self.half, self.half), radius, radius)
+                painter.end()
+                self.heat_dots.append(pixmap)
+        return self.heat_dots[level]
+
+    def selection(self):
+        """Outline drawn over the selected tile"""
+        if self.selection_outline is None:
+            pixmap, painter = self._blank()
+            painter.setPen(QPen(QColor(255, 215, 0), 4))
+            tracing.count("pens_created")
+            painter.drawPolygon(self.hexagon)
+            painter.end()
+            self.selection_outline = pixmap
+        return self.selection_outline
+
+    def number(self, number):
+        if number not in self.numbers:
+            self.numbers[number] = self._text(str(number), self.number_font, QColor("red") if number in RED_NUMBERS else QColor("black"))
+        return self.numbers[number]
+
+    def harbor(self, harbor_type):
+        if harbor_type not in self.harbors:
+            self.harbors[harbor_type] = self._text(str(HARBOR_SYMBOLS.get(harbor_type)), self.harbor_font, QColor("black"))
+        return self.harbors[harbor_type]
+
+def draw_tiles(painter, board, sprites, spatial_index, hex_size, left, top, right, bottom):
     """
-    Defines a tile both graphically and under the hood.
-    Tile can be a:
-    - Resource - (i.e sheep, ore) which utilizes the number token and resource type,
-    - Water - could be a harbor which will track its harbor type.
-    or water, which .
-    All tiles carry geometric information where the hexagon can be "pointy" (axial) or "flat" (row/col)
+    Blits the tiles of board that intersect the pixel rectangle (left, top, right, bottom).
+    Shared by the widget and the exporters, so a board looks the same on screen and on disk.
+    Returns how many tiles were drawn.
     """
-    def __init__(self, polygon, r, c, resource_type="desert", number=None, harbor_type=None, harbor_orientation=None):
-        self.polygon = polygon
-        self.r, self.c = r, c
-        self.resource_type = resource_type
-        self.number = number
-        self.harbor_type = harbor_type
-        self.harbor_orientation = harbor_orientation
+    visible = spatial_index.query(left / hex_size, top / hex_size, right / hex_size, bottom / hex_size)
+    centers = board.template.unit_centers[visible] * hex_size - sprites.half
+    resources, numbers, harbors = board.resources, board.numbers, board.harbors
+    draw = sprites.drawer(painter)
+    for index, (x, y) in zip(visible.tolist(), centers.tolist()):
+        top_left = QPointF(x, y)
+        draw(top_left, sprites.tile(RESOURCE_TYPES[resources[index]]))
+        if numbers[index] != NO_NUMBER:
+            draw(top_left, sprites.number(numbers[index]))
+        if harbors[index]:
+            draw(top_left, sprites.harbor(HARBOR_TYPES[harbors[index]]))
+    return len(visible)
 
 # ====== HexagonGridWidget(QWidget) =============================================
 class HexagonGridWidget(QWidget):
     """
     Will generate a hexagon grid based on resource count.
+    The tiles, numbers and harbors come from board_engine.BoardGenerator, this widget only lays them out and paints them.
     When the number of resource tiles is less than 100, the generator will try to
     utilize the classic hexagonal shape of the catan board
     When the resource tile count is greater than 100, the generator will utilize a more
     rectangular structure.
+    Land tiles can be edited: click two tiles to swap them, right click a tile to set its resource or number.
+    Edits keep stats (see board_stats.BoardStats) current, repaint only the touched hexes and emit board_edited.
     """
+    board_edited = pyqtSignal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.core_rows, self.core_cols = 0, 0
         self.hex_size = 30
-        self.tiles = []
         self.board_shape = ""
         self.harbor_counts = {}
+        self.engine = BoardGenerator()
+        self.board = None
+        self.sprites = None
+        self.spatial_index = None
+        self.heatmap = None
+        self._heatmap_data = None
+        self.stats = None
+        self.selected = -1
         self.setMinimumSize(400, 400)
 
-    def generate_hexagonal_board(self, resource_pool):
-        """
-        For when the resourse tiles are less than 100, the classic hexagonal shape will be generated
-        Will use axial coordinates 
-        """
-        self.board_shape = "Hexagonal"
-        num_land_tiles = len(resource_pool)
-        
-        n = 2
-        while (3 * n * n - 3 * n + 1) < num_land_tiles:
-            n += 1
-
-        self.core_rows = self.core_cols = 2 * n - 1
-
-        grid_map = {}
-        for q in range(-n + 1, n):
-            r1 = max(-n + 1, -q - n + 1)
-            r2 = min(n - 1, -q + n - 1)
-            for r in range(r1, r2 + 1):
-                if not resource_pool: break
-                res = resource_pool.pop()
-                # Number is assigned later
-                grid_map[(q, r)] = (res, None)
-        
-        return self.build_final_grid(grid_map, 'pointy')
-
-    def generate_rectangular_board(self, resource_pool):
-        """When resource tiles are more than 100, will result in a more rectangular shape board"""
-        self.board_shape = "Rectangular"
-        num_land_tiles = len(resource_pool)
-        
-        start_point = int(math.sqrt(num_land_tiles))
-        rows, cols = 1, num_land_tiles
-        for i in range(start_point, 0, -1):
-            if num_land_tiles % i == 0:
-                rows, cols = i, num_land_tiles // i
-                break
-        self.core_rows, self.core_cols = rows, cols
-        
-        grid_map = {}
-        # use col/row layout
-        for r in range(self.core_rows):
-            for c in range(self.core_cols):
-                if not resource_pool: break
-                res = resource_pool.pop()
-                grid_map[(r, c)] = (res, None) # Number is assigned later
-        
-        return self.build_final_grid(grid_map, 'flat')
-
-    def build_final_grid(self, land_tile_map, orientation):
-        """
-        Build the grid of landscapes and surround it with water tiles
-        """
-        grid_map = {}
-        
-        water_coords = set()
-        for r_coord, c_coord in land_tile_map.keys():
-            for neighbor_coord in self.get_neighbors(r_coord, c_coord, orientation):
-                if neighbor_coord not in land_tile_map:
-                    water_coords.add(neighbor_coord)
-        
-        for r, c in water_coords:
-            grid_map[(r, c)] = Tile(None, r, c, "water")
-            
-        for (r, c), (res, num) in land_tile_map.items():
-            grid_map[(r, c)] = Tile(None, r, c, res, num)
-
-        all_coords = list(grid_map.keys())
-        pixel_centers = []
-        for r, c in all_coords:
-            if orientation == 'flat':
-                vert_dist = self.hex_size * math.sqrt(3)
-                horiz_dist = self.hex_size * 1.5
-                offset = vert_dist / 2 if c % 2 else 0
-                x = c * horiz_dist
-                y = r * vert_dist + offset
-            else:
-                x = self.hex_size * math.sqrt(3) * (c + r / 2.0)
-                y = self.hex_size * 1.5 * r
-            pixel_centers.append(QPointF(x,y))
-        
-        min_x = min(p.x() for p in pixel_centers) if pixel_centers else 0
-        min_y = min(p.y() for p in pixel_centers) if pixel_centers else 0
-
-        offset_x = self.hex_size - min_x
-        offset_y = self.hex_size - min_y
-
-        for (r, c), tile in grid_map.items():
-            if orientation == 'flat':
-                vert_dist = self.hex_size * math.sqrt(3)
-                horiz_dist = self.hex_size * 1.5
-                offset = vert_dist / 2 if c % 2 else 0
-                center_x = c * horiz_dist + offset_x
-                center_y = r * vert_dist + offset + offset_y
-                angle_offset = 0
-            else:
-                center_x = self.hex_size * math.sqrt(3) * (c + r / 2.0) + offset_x
-                center_y = self.hex_size * 1.5 * r + offset_y
-                angle_offset = 30
-
-            hexagon = QPolygonF([QPointF(center_x + self.hex_size * math.cos(math.pi/180 * (i + angle_offset)),
-                                         center_y + self.hex_size * math.sin(math.pi/180 * (i + angle_offset)))
-                                 for i in range(0, 360, 60)])
-            tile.polygon = hexagon
-            
-        return grid_map
-    
-    def get_clump_score(self, tile, grid_map, orientation):
-        """Calculates how many neighbors of a tile have the same resource type."""
-        if not tile or tile.resource_type in ['water', 'desert']:
-            return 0
-        score = 0
-        neighbors = [grid_map.get(n) for n in self.get_neighbors(tile.r, tile.c, orientation) if grid_map.get(n)]
-        for neighbor in neighbors:
-            if neighbor.resource_type == tile.resource_type:
-                score += 1
-        return score
-
-    def separate_resources(self, grid_map, orientation):
-        """
-        Iteratively swaps resource tiles to break up clusters of the same type
-        by reducing the overall "clump score" of the board.
-        """
-        land_tiles = [tile for tile in grid_map.values() if tile.resource_type not in ['water', 'desert']]
-        if not land_tiles:
-            return
+    def render_cache(self):
+        """Tile sprites for the current hex size, only rebuilt when the hex size or the board orientation changed"""
+        template = self.board.template if self.board is not None else None
+        orientation = template.orientation if template is not None else 'pointy'
+        sprites = self.sprites
+        if (sprites is None or sprites.hex_size != self.hex_size or sprites.orientation != orientation
+                or sprites.device_pixel_ratio != self.devicePixelRatioF()):
+            self.sprites = TileSprites(self.hex_size, orientation, self.devicePixelRatioF())
+        return self.sprites
+
+    def set_heatmap(self, metric):
+        """Shows per corner scores over the board, metric is a key of HEATMAP_METRICS or None to hide them"""
+        if metric == self.heatmap: return
+        self.heatmap = metric
+        self._heatmap_data = None
+        self.update()
 
-        # Do several passes to improve distribution
-        for _ in range(5):
-            swapped_in_pass = False
-            for tile1 in land_tiles:
-                score1_before = self.get_clump_score(tile1, grid_map, orientation)
-                
-                # If the tile is not clumped dnt swap it
-                if score1_before == 0:
-                    continue
-
-                # Swap with another resource type
-                for tile2 in land_tiles:
-                    if tile1 == tile2 or tile1.resource_type == tile2.resource_type:
-                        continue
-
-                    score2_before = self.get_clump_score(tile2, grid_map, orientation)
-
-                    tile1.resource_type, tile2.resource_type = tile2.resource_type, tile1.resource_type
-                    
-                    score1_after = self.get_clump_score(tile1, grid_map, orientation)
-                    score2_after = self.get_clump_score(tile2, grid_map, orientation)
-
-                    # Did it reduce clump?
-                    if (score1_after + score2_after) < (score1_before + score2_before):
-                        swapped_in_pass = True
-                        break
-                    else:
-                        # undo if it didn't work
-                        tile1.resource_type, tile2.resource_type = tile2.resource_type, tile1.resource_type
-            
-            # if it searched and didn't need to swap, we are good
-            if not swapped_in_pass:
-                break
+    def heatmap_data(self):
+        """(positions, levels, spatial index) of the corner scores, computed once per board and metric"""
+        if self._heatmap_data is None and self.heatmap is not None and self.board is not None and self.board.template is not None:
+            index, vertex_pips, diversity = board_vertex_scores(self.board)
+            scores = vertex_pips if self.heatmap == "pips" else diversity
+            top = max(int(scores.max()) if len(scores) else 0, 1)
+            levels = (scores * (HEATMAP_LEVELS - 1) + top // 2) // top
+            self._heatmap_data = (index.positions, levels, HexSpatialIndex(index.positions))
+        return self._heatmap_data
+
+    def has_tiles(self):
+        """True when a board with at least one tile is shown, without making a Tile view per tile"""
+        return self.board is not None and self.board.template is not None and self.board.template.num_tiles > 0
+
+    def update_extent(self):
+        """Grows the widget to fit the whole board at the current hex size, a scroll area around it can pan"""
+        width = height = 0
+        if self.has_tiles():
+            width, height = ((self.board.template.unit_centers.max(axis=0) + 1) * self.hex_size).tolist()
+        self.setMinimumSize(max(400, math.ceil(width)), max(400, math.ceil(height)))
 
     def generate_grid(self, resource_counts):
-        """The main grid generation orchestrator."""
-        num_land_tiles = sum(resource_counts.values())
-        if num_land_tiles <= 0:
-            self.core_rows, self.core_cols, self.tiles = 0, 0, []
-            self.update()
+        """Runs the board engine on the calling thread and shows the result."""
+        self.set_board(self.engine.generate(resource_counts))
+
+    def set_board(self, board):
+        """Shows a generated board, the tiles are laid out from the template's unit centers when painted."""
+        self.board = board
+        self.board_shape = board.board_shape
+        self.core_rows, self.core_cols = board.core_rows, board.core_cols
+        self.harbor_counts = board.harbor_counts
+        template = board.template
+        self.spatial_index = HexSpatialIndex(template.unit_centers) if template is not None else None
+        self._heatmap_data = None
+        self.stats = BoardStats(board)
+        self.selected = -1
+        self.update_extent()
+        self.update()
+
+    def get_neighbors(self, r, c, orientation): return get_neighbors(r, c, orientation)
+
+    def paintEvent(self, event):
+        """Blits the cached sprites of the tiles that intersect the exposed rectangle"""
+        if not self.has_tiles():
             return
+        with tracing.run("paint"):
+            with tracing.phase("render_cache"):
+                sprites = self.render_cache()
+            rect, size = event.rect(), self.hex_size
+            painter = QPainter(self)
+            with tracing.phase("tiles"):
+                tracing.count("tiles_painted", draw_tiles(painter, self.board, sprites, self.spatial_index, size,
+                                                          rect.left(), rect.top(), rect.right() + 1, rect.bottom() + 1))
+
+            heatmap = self.heatmap_data()
+            if heatmap is not None:
+                with tracing.phase("heatmap"):
+                    positions, levels, vertex_index = heatmap
+                    visible = vertex_index.query(rect.left() / size, rect.top() / size,
+                                                 (rect.right() + 1) / size, (rect.bottom() + 1) / size)
+                    corners = positions[visible] * size - sprites.half
+                    for level, (x, y) in zip(levels[visible].tolist(), corners.tolist()):
+                        painter.drawPixmap(QPointF(x, y), sprites.heat_dot(level))
+                    tracing.count("heat_dots_painted", len(visible))
+            if self.selected >= 0:
+                x, y = (self.board.template.unit_centers[self.selected] * size - sprites.half).tolist()
+                painter.drawPixmap(QPointF(x, y), sprites.selection())
+            painter.end()
 
-        resource_pool = [res for res, count in resource_counts.items() for _ in range(count)]
-        random.shuffle(resource_pool)
+    # ---- editing ----------------------------------------------------------------
+    def tile_at(self, x, y):
+        """Index of the tile under the widget pixel (x, y), -1 when there is none"""
+        if self.spatial_index is None: return -1
+        return self.spatial_index.nearest(x / self.hex_size, y / self.hex_size)
 
-        orientation = 'pointy' if num_land_tiles < 100 else 'flat'
-        if orientation == 'pointy':
-            grid_map = self.generate_hexagonal_board(resource_pool)
+    def tile_rect(self, index):
+        """Widget rectangle covering the sprites of one tile"""
+        sprites = self.render_cache()
+        x, y = (self.board.template.unit_centers[index] * self.hex_size - sprites.half).tolist()
+        return QRect(math.floor(x), math.floor(y), sprites.side + 2, sprites.side + 2)
+
+    def tiles_changed(self, *indices):
+        """Repaints only the given tiles, unless the heatmap is shown, its corner scores change with them"""
+        if self.heatmap is not None:
+            self._heatmap_data = None
+            self.update()
         else:
-            grid_map = self.generate_rectangular_board(resource_pool)
-        
-        # tries to separate clumps of resources
-        self.separate_resources(grid_map, orientation)
-
-        # Assign numbers after resources are finalized
-        productive_land_tiles = [tile for tile in grid_map.values() if tile.resource_type not in ['water', 'desert']]
-        random.shuffle(productive_land_tiles)
-        
-        num_productive_tiles = len(productive_land_tiles)
-        total_prop_parts = sum(NUMBER_RATIOS.values())
-        number_pool = []
-        if num_productive_tiles > 0 and total_prop_parts > 0:
-            number_pool = [num for num, parts in NUMBER_RATIOS.items() for _ in range(round(num_productive_tiles * (parts / total_prop_parts)))]
-        while len(number_pool) < num_productive_tiles: number_pool.append(random.choice(list(NUMBER_RATIOS.keys())))
-        while len(number_pool) > num_productive_tiles: number_pool.pop()
-        random.shuffle(number_pool)
-        
-        for tile in productive_land_tiles:
-            if number_pool:
-                tile.number = number_pool.pop()
-
-        # harbor placement. TODO ensure that generic harbor gets utilized first based on ratio
-        coastal_water_tiles = [tile for tile in grid_map.values() if tile.resource_type == 'water' and any(grid_map.get(n) and grid_map.get(n).resource_type != 'water' for n in self.get_neighbors(tile.r, tile.c, orientation))]
-        
-        harbor_slots, used_and_neighbor_coords = [], set()
-        for tile in sorted(coastal_water_tiles, key=lambda t: (t.r, t.c)):
-            if (tile.r, tile.c) not in used_and_neighbor_coords:
-                harbor_slots.append(tile)
-                used_and_neighbor_coords.add((tile.r, tile.c))
-                for neighbor_coord in self.get_neighbors(tile.r, tile.c, orientation): used_and_neighbor_coords.add(neighbor_coord)
-        
-        num_harbor_slots = len(harbor_slots)
-        num_base_game_sets = num_land_tiles / sum(LAND_RESOURCE_RATIOS.values())
-        
-        self.harbor_counts = {}
-        total_ratio_harbors = 0
-        for harbor_type, ratio in HARBOR_RATIOS.items():
-            count = round(ratio * num_base_game_sets)
-            self.harbor_counts[harbor_type] = count
-            total_ratio_harbors += count
-        
-        if num_harbor_slots > total_ratio_harbors:
-            self.harbor_counts['generic'] = self.harbor_counts.get('generic', 0) + (num_harbor_slots - total_ratio_harbors)
-
-        harbor_pool = [harbor for harbor, count in self.harbor_counts.items() for _ in range(count)]
-        random.shuffle(harbor_pool)
-
-        for slot in harbor_slots:
-            if not harbor_pool: break
-            land_neighbor = [n for n in self.get_neighbors(slot.r, slot.c, orientation) if grid_map.get(n) and grid_map.get(n).resource_type != 'water'][0]
-            dr, dc = land_neighbor[0] - slot.r, land_neighbor[1] - slot.c
-            
-            if orientation == 'flat':
-                if slot.c % 2 == 0: orientation_map = {(-1,-1):5,(-1,0):4,(-1,1):3,(0,1):2,(1,0):1,(0,-1):0}
-                else: orientation_map = {(0,-1):5,(-1,0):4,(0,1):3,(1,1):2,(1,0):1,(1,-1):0}
+            for index in indices: self.update(self.tile_rect(index))
+        self.board_edited.emit()
+
+    def select_tile(self, index):
+        previous, self.selected = self.selected, index
+        for tile in (previous, index):
+            if tile >= 0: self.update(self.tile_rect(tile))
+
+    def swap_tiles(self, i, j):
+        self.stats.swap(i, j)
+        self.tiles_changed(i, j)
+
+    def edit_tile(self, index, resource_type, number):
+        self.stats.edit(index, resource_type, number)
+        self.tiles_changed(index)
+
+    def mousePressEvent(self, event):
+        index = self.tile_at(event.position().x(), event.position().y())
+        if index < 0 or self.board.resources[index] == WATER:
+            self.select_tile(-1)
+            return
+        if event.button() == Qt.MouseButton.RightButton:
+            self.select_tile(-1)
+            self.show_tile_menu(index, event.globalPosition().toPoint())
+        elif event.button() == Qt.MouseButton.LeftButton:
+            if self.selected < 0:
+                self.select_tile(index)
             else:
-                orientation_map = {(0,1):2,(1,0):3, (1,-1):4, (0,-1):5, (-1,0):0, (-1,1):1}
-            slot.harbor_type, slot.harbor_orientation = harbor_pool.pop(), orientation_map.get((dr, dc))
-        
-        self.tiles = list(grid_map.values())
-        self.update()
+                other = self.selected
+                self.select_tile(-1)
+                if other != index: self.swap_tiles(other, index)
 
-    def get_neighbors(self, r, c, orientation):
-        if orientation == 'flat':
-            if c % 2 == 0: offsets = [(-1,0),(-1,1),(0,1),(1,0),(0,-1),(-1,-1)]
-            else: offsets = [(-1,0),(0,1),(1,1),(1,0),(1,-1),(-1,-1)]
-            return [(r + dr, c + dc) for dr, dc in offsets]
-        else:
-            q, r_ax = r, c
-            axial_offsets = [(0,1),(1,0),(1,-1),(0,-1),(-1,0),(-1,1)]
-            return [(q + dq, r_ax + dr) for dq, dr in axial_offsets]
+    def show_tile_menu(self, index, position):
+        """Resource and number choices for one land tile, deserts get no number"""
+        board = self.board
+        resource_type, number = RESOURCE_TYPES[board.resources[index]], board.numbers[index] or None
+        menu = QMenu(self)
+        resource_menu = menu.addMenu("Resource")
+        for resource in LAND_RESOURCES:
+            action = resource_menu.addAction(resource.title())
+            action.setCheckable(True)
+            action.setChecked(resource == resource_type)
+            action.triggered.connect(lambda checked, res=resource: self.edit_tile(index, res, number))
+        number_menu = menu.addMenu("Number")
+        number_menu.setEnabled(board.resources[index] != DESERT)
+        for choice in sorted(NUMBER_RATIOS):
+            action = number_menu.addAction(str(choice))
+            action.setCheckable(True)
+            action.setChecked(choice == number)
+            action.triggered.connect(lambda checked, n=choice: self.edit_tile(index, resource_type, n))
+        menu.exec(position)
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        for tile in self.tiles:
-            if not tile.polygon: continue
-            painter.setPen(QPen(QColor(0,0,0), 2))
-            painter.setBrush(QBrush(RESOURCE_COLORS.get(tile.resource_type, QColor("gray"))))
-            painter.drawPolygon(tile.polygon)
-            if tile.number is not None:
-                font = QFont("Arial", int(self.hex_size*0.5), QFont.Weight.Bold)
-                painter.setFont(font)
-                painter.setPen(QColor("red") if tile.number in RED_NUMBERS else QColor("black"))
-                painter.drawText(tile.polygon.boundingRect(), Qt.AlignmentFlag.AlignCenter, str(tile.number))
-            if tile.harbor_type is not None:
-                font = QFont("Arial", int(self.hex_size*0.3), QFont.Weight.Bold)
-                painter.setFont(font)
-                painter.setPen(QColor("black"))
-                painter.drawText(tile.polygon.boundingRect(), Qt.AlignmentFlag.AlignCenter, HARBOR_SYMBOLS.get(tile.harbor_type))
-
-    def set_hex_size(self, size): self.hex_size = size
+    def set_hex_size(self, size):
+        """Rescales the current board, the tiles are kept as they are"""
+        if size == self.hex_size: return
+        self.hex_size = size
+        self.update_extent()
+        self.update()
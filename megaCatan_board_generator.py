@@ -1,21 +1,46 @@
 import sys
+import multiprocessing
 
 # ====== Graphical library imports ==============================================
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QGridLayout, 
-                             QSlider, QLabel, QLineEdit, QPushButton, QSplitter)
+                             QSlider, QLabel, QLineEdit, QPushButton, QSplitter, QScrollArea,
+                             QProgressBar, QComboBox, QFileDialog, QMessageBox, QInputDialog,
+                             QSpinBox, QDoubleSpinBox, QCheckBox)
 from PyQt6.QtGui import QFont
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
 
 # ====== Imports from local files  ==============================================
+import tracing
 from globals import LAND_RESOURCES, LAND_RESOURCE_RATIOS
-from landscape import HexagonGridWidget
+from landscape import HexagonGridWidget, HEATMAP_METRICS
+from generation_worker import GenerationWorker, ExportWorker
+from board_archive import BoardArchive
+from board_search import BoardSearch, SearchPool
+
+# Quiet time after the last keystroke before the other resource fields follow
+RATIO_DEBOUNCE_MS = 300
 
 # ====== MainWindow(QMainWindow)   ==============================================
 class MainWindow(QMainWindow):
+    # a traced run finished, emitted from whichever thread traced it
+    trace_finished = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("MegaCatan Hexagon Grid Generator")
         self._is_updating_fields = False
+        self._pending_resource = None
+        self.worker = None
+        self._stale_workers = []
+        self.export_worker = None
+        self.search_info = ""
+        # started with the first search and kept until the window closes
+        self.search_pool = None
+
+        self._ratio_timer = QTimer(self)
+        self._ratio_timer.setSingleShot(True)
+        self._ratio_timer.setInterval(RATIO_DEBOUNCE_MS)
+        self._ratio_timer.timeout.connect(self.apply_pending_ratio)
         
         self.hexagon_grid = HexagonGridWidget()
         controls_widget = QWidget()
@@ -25,7 +50,7 @@ class MainWindow(QMainWindow):
         self.resource_edits = {}
         for i, resource in enumerate(LAND_RESOURCES):
             self.resource_edits[resource] = QLineEdit()
-            self.resource_edits[resource].textChanged.connect(lambda text, res=resource: self.update_resource_ratios(res))
+            self.resource_edits[resource].textChanged.connect(lambda text, res=resource: self.queue_resource_ratio_update(res))
             controls_layout.addWidget(QLabel(f"{resource.title()}:"), i, 0)
             controls_layout.addWidget(self.resource_edits[resource], i, 1)
 
@@ -41,33 +66,109 @@ class MainWindow(QMainWindow):
         controls_layout.addWidget(self.size_edit, current_row, 2)
         current_row += 1
 
+        self.heatmap_combo = QComboBox()
+        self.heatmap_combo.addItem("Off", None)
+        for metric, title in HEATMAP_METRICS.items():
+            self.heatmap_combo.addItem(title, metric)
+        controls_layout.addWidget(QLabel("Heatmap:"), current_row, 0)
+        controls_layout.addWidget(self.heatmap_combo, current_row, 1)
+        current_row += 1
+
+        # more than one candidate turns generate into a best of K search
+        self.candidates_spin = QSpinBox()
+        self.candidates_spin.setRange(1, 256)
+        self.candidates_spin.setToolTip("Boards to generate, the fairest one is shown")
+        controls_layout.addWidget(QLabel("Candidates:"), current_row, 0)
+        controls_layout.addWidget(self.candidates_spin, current_row, 1)
+        current_row += 1
+
+        self.search_budget_spin = QDoubleSpinBox()
+        self.search_budget_spin.setRange(0.5, 600.0)
+        self.search_budget_spin.setValue(10.0)
+        self.search_budget_spin.setSuffix(" s")
+        self.search_budget_spin.setToolTip("The search shows the best board so far once this time is up")
+        controls_layout.addWidget(QLabel("Search Time:"), current_row, 0)
+        controls_layout.addWidget(self.search_budget_spin, current_row, 1)
+        current_row += 1
+
         self.generate_button = QPushButton("Generate Board")
         controls_layout.addWidget(self.generate_button, current_row, 0, 1, 3)
         current_row += 1
 
+        self.export_button = QPushButton("Export Board")
+        controls_layout.addWidget(self.export_button, current_row, 0, 1, 3)
+        current_row += 1
+
+        self.archive_button = QPushButton("Add to Archive")
+        self.open_archive_button = QPushButton("Open from Archive")
+        controls_layout.addWidget(self.archive_button, current_row, 0, 1, 2)
+        controls_layout.addWidget(self.open_archive_button, current_row, 2)
+        current_row += 1
+
+        self.profile_check = QCheckBox("Profile")
+        self.profile_check.setToolTip("Times every generation and paint stage, shown below the board stats")
+        controls_layout.addWidget(self.profile_check, current_row, 0, 1, 3)
+        current_row += 1
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        controls_layout.addWidget(self.progress_bar, current_row, 0, 1, 3)
+        current_row += 1
+
         self.grid_dims_label = QLabel()
         self.grid_dims_label.setFont(QFont("Arial", 12, QFont.Weight.Bold))
         controls_layout.addWidget(self.grid_dims_label, current_row, 0, 1, 3, Qt.AlignmentFlag.AlignCenter | Qt.AlignmentFlag.AlignTop)
         current_row += 1
 
+        self.trace_label = QLabel()
+        self.trace_label.setFont(QFont("Courier", 9))
+        self.trace_label.setVisible(False)
+        controls_layout.addWidget(self.trace_label, current_row, 0, 1, 3, Qt.AlignmentFlag.AlignCenter | Qt.AlignmentFlag.AlignTop)
+        current_row += 1
+
         controls_layout.setRowStretch(current_row, 1)
         controls_layout.setColumnStretch(3, 1)
 
         splitter = QSplitter(Qt.Orientation.Horizontal)
-        splitter.addWidget(self.hexagon_grid)
+        # the grid grows to fit the board, the scroll area pans over it
+        self.grid_scroll = QScrollArea()
+        self.grid_scroll.setWidgetResizable(True)
+        self.grid_scroll.setWidget(self.hexagon_grid)
+        splitter.addWidget(self.grid_scroll)
         splitter.addWidget(controls_widget)
         splitter.setSizes([800, 350]) 
         self.setCentralWidget(splitter)
         
         self.generate_button.clicked.connect(self.handle_generate_button)
+        self.export_button.clicked.connect(self.handle_export_button)
+        self.hexagon_grid.board_edited.connect(self.update_stats_label)
+        self.archive_button.clicked.connect(self.handle_archive_button)
+        self.open_archive_button.clicked.connect(self.handle_open_archive_button)
         self.size_slider.valueChanged.connect(self.update_hex_size_from_slider)
         self.size_edit.editingFinished.connect(self.update_from_text_hex_size)
+        self.profile_check.toggled.connect(self.set_profiling)
+        self.trace_finished.connect(self.update_trace_label)
+        self.heatmap_combo.currentIndexChanged.connect(lambda index: self.hexagon_grid.set_heatmap(self.heatmap_combo.currentData()))
 
         self.size_slider.setValue(self.hexagon_grid.hex_size)
         self.size_edit.setText(str(self.hexagon_grid.hex_size))
         self.resource_edits["desert"].setText("1")
         self.handle_generate_button()
 
+    def queue_resource_ratio_update(self, changed_resource):
+        """Debounces the ratio propagation and drops any generation made from the old inputs"""
+        if self._is_updating_fields: return
+        self._pending_resource = changed_resource
+        self.cancel_generation()
+        self._ratio_timer.start()
+
+    def apply_pending_ratio(self):
+        self._ratio_timer.stop()
+        if self._pending_resource is not None:
+            self.update_resource_ratios(self._pending_resource)
+            self._pending_resource = None
+
     def update_resource_ratios(self, changed_resource):
         if self._is_updating_fields: return
         self._is_updating_fields = True
@@ -88,27 +189,187 @@ class MainWindow(QMainWindow):
         self._is_updating_fields = False
 
     def handle_generate_button(self):
+        # typing right before clicking should still count
+        self.apply_pending_ratio()
         resource_counts = {res: int(edit.text()) if edit.text().isdigit() else 0 for res, edit in self.resource_edits.items()}
         self.hexagon_grid.set_hex_size(self.size_slider.value())
-        self.hexagon_grid.generate_grid(resource_counts)
-        
-        total_land_tiles = sum(resource_counts.values())
-        total_harbors = sum(self.hexagon_grid.harbor_counts.values())
-        total_grid_tiles = len(self.hexagon_grid.tiles)
-        total_water_tiles = total_grid_tiles - total_land_tiles
+
+        self.cancel_generation()
+        search = None
+        if self.candidates_spin.value() > 1:
+            if self.search_pool is None:
+                # spawned workers, forking a process that runs Qt threads is not safe
+                self.search_pool = SearchPool(multiprocessing.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+            search = BoardSearch(self.candidates_spin.value(), time_budget=self.search_budget_spin.value(), pool=self.search_pool)
+        self.worker = GenerationWorker(resource_counts, self.hexagon_grid.engine, self, search)
+        self.worker.progress.connect(self.update_progress)
+        self.worker.board_ready.connect(self.show_board)
+        self.worker.finished.connect(self.forget_finished_worker)
+        self.progress_bar.setValue(0)
+        self.worker.start()
+
+    def cancel_generation(self):
+        """Stops the running generation, its board will never be shown"""
+        if self.worker is not None:
+            self.worker.cancel()
+            self._stale_workers.append(self.worker)
+            self.worker = None
+            self.progress_bar.setValue(0)
+            self.progress_bar.setFormat("%p%")
+
+    def forget_finished_worker(self):
+        """Drops a finished worker, shown or stale, and deletes it, as a child of the window it would live on otherwise"""
+        worker = self.sender()
+        if worker is self.worker:
+            # still current after finishing, so no board came, a failure is reported and a cancel is not
+            self.worker = None
+            self.progress_bar.setValue(0)
+            self.progress_bar.setFormat("Generation failed" if worker.error is not None else "%p%")
+            if worker.error is not None:
+                QMessageBox.warning(self, "Generate Board", worker.error)
+        self._stale_workers = [stale for stale in self._stale_workers if stale is not worker]
+        worker.deleteLater()
+
+    def update_progress(self, percent, stage):
+        if self.sender() is not self.worker: return
+        self.progress_bar.setValue(percent)
+        self.progress_bar.setFormat(f"{stage.title()} %p%")
+
+    def show_board(self, board):
+        if self.sender() is not self.worker: return
+        search, self.worker = self.worker.search, None
+        self.search_info = f"Score: {search.best_score:.2f} (best of {search.evaluated})" if search is not None else ""
+        self.hexagon_grid.set_board(board)
+        self.update_stats_label()
+
+    def handle_export_button(self):
+        """
+        Saves the shown board as one SVG or as a folder of PNG tiles, written piece by piece in a worker thread.
+        While it runs the button cancels it.
+        """
+        if self.export_worker is not None:
+            self.export_worker.cancel()
+            return
+        board = self.hexagon_grid.board
+        if board is None or board.template is None: return
+        path, file_filter = QFileDialog.getSaveFileName(self, "Export Board", f"board_{board.seed}.svg",
+                                                        "SVG image (*.svg);;PNG tiles folder (*)")
+        if not path: return
+
+        # a copy, tiles edited while the export runs do not end up half in the files
+        self.export_worker = ExportWorker(board.copy(), path, file_filter.startswith("SVG"), self)
+        self.export_worker.progress.connect(self.update_export_progress)
+        self.export_worker.finished.connect(self.forget_export_worker)
+        self.export_button.setText("Cancel Export")
+        self.update_export_progress(0, "exporting")
+        self.export_worker.start()
+
+    def update_export_progress(self, percent, stage):
+        # a running generation owns the bar, it is only borrowed while none is
+        if self.worker is not None: return
+        self.progress_bar.setValue(percent)
+        self.progress_bar.setFormat(f"{stage.title()} %p%")
+
+    def forget_export_worker(self):
+        worker, self.export_worker = self.export_worker, None
+        self.export_button.setText("Export Board")
+        if self.worker is None:
+            self.progress_bar.setFormat("Exported %p%" if worker.written else "Export failed" if worker.error else "Export cancelled")
+        if worker.error is not None:
+            QMessageBox.warning(self, "Export Board", worker.error)
+        worker.deleteLater()
+
+    def handle_archive_button(self):
+        """Appends the shown board to a board archive, the file is created when it does not exist yet"""
+        board = self.hexagon_grid.board
+        if board is None or board.template is None: return
+        path, _ = QFileDialog.getSaveFileName(self, "Add to Archive", "boards.mcb", "Board archive (*.mcb)",
+                                              options=QFileDialog.Option.DontConfirmOverwrite)
+        if not path: return
+        try:
+            with BoardArchive(path, "a") as archive:
+                index = archive.append(board)
+        except (OSError, ValueError) as error:
+            QMessageBox.warning(self, "Add to Archive", str(error))
+            return
+        self.progress_bar.setFormat(f"Archived as board {index}")
+
+    def handle_open_archive_button(self):
+        """Shows one board of an archive, picked by its position in the file"""
+        path, _ = QFileDialog.getOpenFileName(self, "Open from Archive", "", "Board archive (*.mcb)")
+        if not path: return
+        try:
+            with BoardArchive(path) as archive:
+                if not len(archive): return
+                index, accepted = QInputDialog.getInt(self, "Open from Archive", f"Board (0 - {len(archive) - 1}):",
+                                                      len(archive) - 1, 0, len(archive) - 1)
+                if not accepted: return
+                board = archive.load(index)
+        except (OSError, ValueError) as error:
+            QMessageBox.warning(self, "Open from Archive", str(error))
+            return
+        self.cancel_generation()
+        self.search_info = ""
+        self.hexagon_grid.set_board(board)
+        self.update_stats_label()
+
+    def update_stats_label(self):
+        # kept current by the widget while tiles are edited, reading them is O(1)
+        stats = self.hexagon_grid.stats
         
         shape_info = f"Shape: {self.hexagon_grid.board_shape}"
         if self.hexagon_grid.board_shape == "Rectangular":
             shape_info = f"Grid: {self.hexagon_grid.core_rows} x {self.hexagon_grid.core_cols}"
 
         self.grid_dims_label.setText(
-            f"Land Tiles: {total_land_tiles}\n"
-            f"Water Tiles: {total_water_tiles}\n"
-            f"Harbors: {total_harbors}\n"
-            f"{shape_info}"
+            f"Land Tiles: {stats.land_tiles}\n"
+            f"Water Tiles: {stats.water_tiles}\n"
+            f"Harbors: {stats.harbors}\n"
+            f"{shape_info}\n"
+            f"Clump Score: {stats.clump}\n"
+            f"Red Number Conflicts: {stats.red_conflicts}\n"
+            f"Seed: {self.hexagon_grid.board.seed}"
+            + (f"\n{self.search_info}" if self.search_info else "")
         )
 
-    def update_hex_size_from_slider(self, value): self.size_edit.setText(str(value))
+    def set_profiling(self, on):
+        """Turns tracing on for this process and shows the breakdown of the last generation and paint"""
+        if on: tracing.add_listener(self.on_trace_event)
+        else: tracing.remove_listener(self.on_trace_event)
+        tracing.enable(on)
+        self.trace_label.setVisible(on)
+        self.update_trace_label()
+
+    def on_trace_event(self, event, trace, name, value):
+        # may run on the generation thread, the signal hands the update to the GUI thread
+        if event == "end": self.trace_finished.emit()
+
+    def update_trace_label(self):
+        lines = []
+        for name in ("generate", "paint"):
+            trace = tracing.last_trace(name)
+            if trace is None: continue
+            lines.append(f"{name}: {trace.seconds * 1000:.1f} ms")
+            lines += [f"  {phase:<28}{seconds * 1000:>9.1f} ms" for phase, seconds in trace.phase_totals().items()]
+            lines += [f"  {counter:<28}{value:>9}" for counter, value in trace.counters.items()]
+        self.trace_label.setText("\n".join(lines) or "Generate or repaint to see a trace")
+
+    def closeEvent(self, event):
+        if self.profile_check.isChecked(): tracing.remove_listener(self.on_trace_event)
+        self.cancel_generation()
+        if self.export_worker is not None:
+            self.export_worker.cancel()
+            self.export_worker.wait()
+        for worker in self._stale_workers:
+            worker.wait()
+        if self.search_pool is not None:
+            self.search_pool.close()
+        super().closeEvent(event)
+
+    def update_hex_size_from_slider(self, value):
+        self.size_edit.setText(str(value))
+        # only rescales the board on screen, generating a new one is left to the button
+        self.hexagon_grid.set_hex_size(value)
     def update_from_text_hex_size(self):
         try:
             value = int(self.size_edit.text())
@@ -0,0 +1,201 @@
+import time
+import random
+
+import tracing
+
+from globals import RED_NUMBERS
+
+# Most pips allowed on the three tiles around a corner, 6 + 4 + 2 style corners stay legal
+DEFAULT_MAX_INTERSECTION_PIPS = 12
+
+# Dots on a number token, the count of 2d6 rolls out of 36 that produce it, indexed by the number
+PIPS = [0, 0] + [6 - abs(7 - number) for number in range(2, 13)]
+
+def pips(number):
+    return PIPS[number] if number else 0
+
+def forbidden_mask(number):
+    """Bitset of the numbers that may not sit next to number"""
+    mask = 1 << number
+    if number in RED_NUMBERS:
+        for red in RED_NUMBERS: mask |= 1 << red
+    return mask
+
+# ====== NumberPlacer              ==============================================
+class NumberPlacer:
+    """
+    Places number tokens on the productive tiles so that:
+    - no two red numbers are neighbors,
+    - no number sits next to the same number,
+    - the pips of the three tiles around any corner stay at or below max_intersection_pips.
+    Tokens are first placed greedily, hardest numbers first, on tiles where they break nothing.
+    During that pass every tile carries a bitset of the numbers its neighbors forbid and the pips
+    its corners still have room for, so testing a tile is O(1).
+    Whatever is left over is repaired by swapping tokens, each swap is judged only on the
+    neighbors and corners of the two tiles, so one step costs O(degree).
+    """
+    def __init__(self, max_intersection_pips=DEFAULT_MAX_INTERSECTION_PIPS, max_iterations=None,
+                 time_budget=None, samples=16, rng=None):
+        self.max_intersection_pips = max_intersection_pips
+        self.max_iterations = max_iterations
+        self.time_budget = time_budget
+        self.samples = samples
+        self.rng = rng if rng is not None else random.Random()
+
+    def build(self, board, tiles):
+        """Indexes the productive tiles, their productive neighbors and the corners they share"""
+        self.tiles = tiles
+        template = board.template
+        index = {board_index: i for i, board_index in enumerate(tiles)}
+        self.neighbors = [[index[n] for n in template.neighbors_of(board_index) if n in index] for board_index in tiles]
+        corners = template.intersections
+        self.corners = [[index[corners[k]], index[corners[k + 1]], index[corners[k + 2]]] for k in range(0, len(corners), 3)
+                        if corners[k] in index and corners[k + 1] in index and corners[k + 2] in index]
+        self.corners_of = [[] for _ in tiles]
+        for k, corner in enumerate(self.corners):
+            for i in corner: self.corners_of[i].append(k)
+        self.numbers = [None] * len(tiles)
+        self.corner_pips = [0] * len(self.corners)
+        self.conflicted, self.conflicted_pos = [], {}
+
+    # ---- constraint checks ------------------------------------------------------
+    def clashes(self, number, other):
+        return other is not None and (number == other or (number in RED_NUMBERS and other in RED_NUMBERS))
+
+    def tile_cost(self, i):
+        """Broken constraints touching tile i"""
+        number = self.numbers[i]
+        cost = sum(1 for k in self.neighbors[i] if self.clashes(number, self.numbers[k]))
+        return cost + sum(1 for k in self.corners_of[i] if self.corner_pips[k] > self.max_intersection_pips)
+
+    def pair_cost(self, i, j):
+        """Broken constraints touching i or j, each counted once"""
+        edges = sum(1 for k in self.neighbors[i] if self.clashes(self.numbers[i], self.numbers[k]))
+        edges += sum(1 for k in self.neighbors[j] if k != i and self.clashes(self.numbers[j], self.numbers[k]))
+        corners = set(self.corners_of[i])
+        corners.update(self.corners_of[j])
+        return edges + sum(1 for k in corners if self.corner_pips[k] > self.max_intersection_pips)
+
+    # ---- bookkeeping ------------------------------------------------------------
+    def put(self, i, number):
+        change = pips(number) - pips(self.numbers[i])
+        self.numbers[i] = number
+        corner_pips = self.corner_pips
+        for k in self.corners_of[i]:
+            corner_pips[k] += change
+
+    def swap(self, i, j):
+        number_i, number_j = self.numbers[i], self.numbers[j]
+        self.put(i, number_j)
+        self.put(j, number_i)
+
+    def refresh(self, i):
+        if self.tile_cost(i):
+            if i not in self.conflicted_pos:
+                self.conflicted_pos[i] = len(self.conflicted)
+                self.conflicted.append(i)
+        else:
+            pos = self.conflicted_pos.pop(i, None)
+            if pos is None: return
+            last = self.conflicted.pop()
+            if last != i:
+                self.conflicted[pos] = last
+                self.conflicted_pos[last] = pos
+
+    def refresh_around(self, i):
+        self.refresh(i)
+        for k in self.neighbors[i]: self.refresh(k)
+        for corner in self.corners_of[i]:
+            for k in self.corners[corner]: self.refresh(k)
+
+    # ---- search -----------------------------------------------------------------
+    def place_greedy(self, number_pool):
+        """
+        Red numbers first, then by falling pips, each token goes on the first tile in a shuffled
+        order that accepts it. Returns the tokens that found no such tile.
+        """
+        free = list(range(len(self.tiles)))
+        self.rng.shuffle(free)
+        by_number = {}
+        for number in number_pool: by_number[number] = by_number.get(number, 0) + 1
+        order = sorted(by_number, key=lambda n: (n not in RED_NUMBERS, -pips(n), n))
+
+        blocked = [0] * len(self.tiles)
+        room = [self.max_intersection_pips] * len(self.tiles)
+        leftovers = []
+        for number in order:
+            remaining, still_free = by_number[number], []
+            bit, number_pips, mask = 1 << number, pips(number), forbidden_mask(number)
+            for i in free:
+                if remaining and not blocked[i] & bit and number_pips <= room[i]:
+                    self.put(i, number)
+                    remaining -= 1
+                    for k in self.neighbors[i]: blocked[k] |= mask
+                    for corner in self.corners_of[i]:
+                        left = self.max_intersection_pips - self.corner_pips[corner]
+                        for k in self.corners[corner]:
+                            if left < room[k]: room[k] = left
+                else:
+                    still_free.append(i)
+            free = still_free
+            leftovers.extend([number] * remaining)
+        self.rng.shuffle(leftovers)
+        for i, number in zip(free, leftovers):
+            self.put(i, number)
+        return leftovers
+
+    def best_partner(self, i):
+        """Samples tiles and returns the swap partner that lowers the cost the most, level swaps included"""
+        best_delta, best_j = 1, None
+        for j in self.rng.sample(range(len(self.tiles)), min(self.samples, len(self.tiles))):
+            if j == i or self.numbers[j] == self.numbers[i]: continue
+            before = self.pair_cost(i, j)
+            self.swap(i, j)
+            delta = self.pair_cost(i, j) - before
+            self.swap(i, j)
+            if delta < best_delta:
+                best_delta, best_j = delta, j
+        return best_delta, best_j
+
+    def repair(self, progress=None):
+        """
+        Swaps tokens until nothing is broken or the budget runs out, returns the swaps made.
+        progress, when given, is called with a 0 to 1 estimate every few thousand iterations.
+        """
+        for i in range(len(self.tiles)): self.refresh(i)
+        max_iterations = self.max_iterations if self.max_iterations is not None else 200 * len(self.tiles) + 1000
+        deadline = time.perf_counter() + self.time_budget if self.time_budget is not None else None
+        initial_conflicted = max(1, len(self.conflicted))
+        swaps = 0
+        for iteration in range(max_iterations):
+            if not self.conflicted:
+                break
+            if deadline is not None and iteration % 64 == 0 and time.perf_counter() > deadline:
+                break
+            if progress is not None and iteration % 2048 == 0:
+                progress(max(iteration / max_iterations, 1 - len(self.conflicted) / initial_conflicted))
+            i = self.rng.choice(self.conflicted)
+            delta, j = self.best_partner(i)
+            if j is None:
+                continue
+            self.swap(i, j)
+            self.refresh_around(i)
+            self.refresh_around(j)
+            swaps += 1
+        tracing.count("number_swaps", swaps)
+        return swaps
+
+    def run(self, board, tiles, number_pool, progress=None):
+        """
+        Writes a number from number_pool into board.numbers for every index in tiles,
+        returns how many tiles still break a rule. progress is handed to repair().
+        """
+        self.build(board, tiles)
+        leftovers = self.place_greedy(number_pool)
+        tracing.count("numbers_left_by_greedy", len(leftovers))
+        if leftovers:
+            self.repair(progress)
+        for board_index, number in zip(self.tiles, self.numbers):
+            board.numbers[board_index] = number
+        tracing.count("number_conflicts", len(self.conflicted))
+        return len(self.conflicted)
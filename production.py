@@ -0,0 +1,203 @@
+import sys
+import csv
+import json
+import argparse
+
+import numpy as np
+
+from globals import LAND_RESOURCES, LAND_RESOURCE_RATIOS
+from number_placement import PIPS
+from intersections import get_intersection_index, board_arrays
+
+# Resources a roll can produce, the columns of every per resource array
+PRODUCED_RESOURCES = [res for res in LAND_RESOURCES if res != "desert"]
+DICE_SUMS = np.arange(2, 13)
+# Chance of every dice sum from 2 to 12
+SUM_PROBABILITIES = np.array([PIPS[number] for number in DICE_SUMS], dtype=np.float64) / 36
+# Dice rolled per batch, about 8 MB of int8 for the two dice
+CHUNK_ROLLS = 1 << 22
+
+def production_table(board):
+    """
+    (dice sums, intersections, resources) array of what each 2d6 sum gives every intersection, one per touching
+    tile with that number. Index 0 of the first axis is the sum 2. Also returns the intersection index it is for.
+    """
+    index = get_intersection_index(board.template)
+    numbers, codes = board_arrays(board)
+    tiles = index.tiles.reshape(-1)
+    # -1 tile slots fall on a padding tile with no number and no resource
+    numbers, codes = np.append(numbers, 0)[tiles], np.append(codes, -1)[tiles]
+    vertices = np.repeat(np.arange(len(index)), 3)
+    produces = (numbers >= 2) & (codes >= 0)
+    table = np.zeros((len(DICE_SUMS), len(index), len(PRODUCED_RESOURCES)))
+    np.add.at(table, (numbers[produces] - 2, vertices[produces], codes[produces]), 1)
+    return table, index
+
+def tile_production_table(board):
+    """(dice sums, resources) array of how many tiles of every resource a sum activates over the whole board"""
+    numbers, codes = board_arrays(board)
+    produces = (numbers >= 2) & (codes >= 0)
+    table = np.zeros((len(DICE_SUMS), len(PRODUCED_RESOURCES)))
+    np.add.at(table, (numbers[produces] - 2, codes[produces]), 1)
+    return table
+
+# ====== ProductionSimulator       ==============================================
+class ProductionSimulator:
+    """
+    Monte Carlo of how a board produces: games of turns 2d6 rolls each, rolled in batched numpy arrays.
+    Every game's rolls are counted per dice sum. What any intersection produces in a game is a fixed linear
+    combination of those 11 counts, so the mean and covariance of the counts over all games give the exact
+    sample mean and variance of every intersection without a (games x intersections) array:
+    mean = a . m and variance = a' C a for the intersection's column a of production_table.
+    Rolling costs O(games * turns), the statistics O(intersections), a 10k tile board takes well under a second.
+    The robber and the 7 are not modeled, a 7 produces nothing.
+    """
+    def __init__(self, games=10000, turns=100, seed=None):
+        self.games = games
+        self.turns = turns
+        self.seed = seed
+
+    def roll_counts(self, rng, games):
+        """(games, 11) counts of every dice sum over turns rolls of two dice"""
+        rolls = rng.integers(1, 7, size=(games, self.turns), dtype=np.int8)
+        rolls += rng.integers(1, 7, size=(games, self.turns), dtype=np.int8)
+        offsets = np.arange(games, dtype=np.int64)[:, None] * 13
+        counts = np.bincount((rolls + offsets).reshape(-1), minlength=games * 13).reshape(games, 13)
+        return counts[:, 2:].astype(np.float64)
+
+    def count_moments(self, progress=None):
+        """Sample mean (11,) and covariance (11, 11) of the per game dice sum counts"""
+        rng = np.random.default_rng(self.seed)
+        sums, products = np.zeros(len(DICE_SUMS)), np.zeros((len(DICE_SUMS), len(DICE_SUMS)))
+        chunk = max(1, CHUNK_ROLLS // max(1, self.turns))
+        for start in range(0, self.games, chunk):
+            counts = self.roll_counts(rng, min(chunk, self.games - start))
+            sums += counts.sum(axis=0)
+            products += counts.T @ counts
+            if progress is not None:
+                progress(min(start + chunk, self.games) / self.games)
+        games = max(1, self.games)
+        mean = sums / games
+        return mean, products / games - np.outer(mean, mean)
+
+    def run(self, board, progress=None):
+        """Returns the ProductionReport of board, progress(fraction) follows every batch of games"""
+        table, index = production_table(board)
+        tiles = tile_production_table(board)
+        mean, covariance = self.count_moments(progress)
+
+        def moments(columns):
+            """Mean and variance of every column, a production per dice sum"""
+            return mean @ columns, np.maximum(((covariance @ columns) * columns).sum(axis=0), 0.0)
+
+        num_vertices, num_resources = table.shape[1], table.shape[2]
+        vertex_mean, vertex_variance = moments(table.reshape(len(DICE_SUMS), -1))
+        total_mean, total_variance = moments(table.sum(axis=2))
+        board_mean, board_variance = moments(tiles)
+        return ProductionReport(
+            board, index, self.games, self.turns,
+            vertex_mean.reshape(num_vertices, num_resources), vertex_variance.reshape(num_vertices, num_resources),
+            total_mean, total_variance, board_mean, board_variance,
+            self.turns * np.tensordot(SUM_PROBABILITIES, table, axes=1), self.turns * (SUM_PROBABILITIES @ tiles))
+
+# ====== ProductionReport          ==============================================
+class ProductionReport:
+    """
+    What one simulation found, every figure is per game of turns rolls.
+    - mean, variance: (intersections, resources) production of every intersection
+    - total_mean, total_variance: (intersections,) production of all resources together, a candidate starting spot
+    - board_mean, board_variance: (resources,) production of the whole board counting every tile once
+    - exact_mean, exact_board_mean: the same expectations worked out from the dice odds, to check the simulation
+    """
+    def __init__(self, board, index, games, turns, mean, variance, total_mean, total_variance,
+                 board_mean, board_variance, exact_mean, exact_board_mean):
+        self.seed, self.index, self.games, self.turns = board.seed, index, games, turns
+        self.mean, self.variance = mean, variance
+        self.total_mean, self.total_variance = total_mean, total_variance
+        self.board_mean, self.board_variance = board_mean, board_variance
+        self.exact_mean, self.exact_board_mean = exact_mean, exact_board_mean
+
+    def scarcity(self):
+        """
+        {resource: share of LAND_RESOURCE_RATIOS / share of the board's production}, above 1 the resource comes out
+        scarcer than the ratio tables imply, below 1 more plentiful. Resources the board never produces map to None.
+        """
+        wanted = np.array([LAND_RESOURCE_RATIOS[res] for res in PRODUCED_RESOURCES], dtype=np.float64)
+        wanted /= wanted.sum()
+        total = self.board_mean.sum()
+        produced = self.board_mean / total if total else np.zeros(len(PRODUCED_RESOURCES))
+        return {res: float(w / p) if p else None for res, w, p in zip(PRODUCED_RESOURCES, wanted, produced)}
+
+    def starting_positions(self, count=10):
+        """The count best settlement spots as intersection indices, highest expected production first, then lowest variance"""
+        order = np.lexsort((self.total_variance, -self.total_mean))
+        return order[:count].tolist()
+
+    def to_dict(self, top=10):
+        """Summary for comparing boards, the per intersection arrays are left to write_csv"""
+        return {
+            "seed": self.seed,
+            "games": self.games,
+            "turns": self.turns,
+            "intersections": len(self.index),
+            "resources": PRODUCED_RESOURCES,
+            "board_mean": dict(zip(PRODUCED_RESOURCES, self.board_mean.round(4).tolist())),
+            "board_variance": dict(zip(PRODUCED_RESOURCES, self.board_variance.round(4).tolist())),
+            "exact_board_mean": dict(zip(PRODUCED_RESOURCES, self.exact_board_mean.round(4).tolist())),
+            "scarcity": {res: value if value is None else round(value, 4) for res, value in self.scarcity().items()},
+            "starting_positions": [{"intersection": i, "position": self.index.positions[i].round(4).tolist(),
+                                    "tiles": [t for t in self.index.tiles[i].tolist() if t >= 0],
+                                    "mean": round(float(self.total_mean[i]), 4),
+                                    "variance": round(float(self.total_variance[i]), 4)}
+                                   for i in self.starting_positions(top)],
+        }
+
+    def write_json(self, path, top=10):
+        with open(path, "w") as out:
+            json.dump(self.to_dict(top), out, indent=1)
+
+    def write_csv(self, path):
+        """One row per intersection: unit position, mean and variance of every resource and of the total"""
+        with open(path, "w", newline="") as out:
+            writer = csv.writer(out)
+            writer.writerow(["intersection", "x", "y"] + [f"{res}_{stat}" for res in PRODUCED_RESOURCES + ["total"]
+                                                          for stat in ("mean", "variance")])
+            columns = []
+            for k in range(len(PRODUCED_RESOURCES)):
+                columns += [self.mean[:, k], self.variance[:, k]]
+            columns += [self.total_mean, self.total_variance]
+            values = np.round(np.column_stack([self.index.positions] + columns), 4).tolist()
+            for i, row in enumerate(values):
+                writer.writerow([i] + row)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate the production of a board and print the summary as json.")
+    parser.add_argument("archive", nargs="?", default=None, help="board archive to read the board from, a new board is generated when left out")
+    parser.add_argument("-i", "--index", type=int, default=0, help="board of the archive to simulate")
+    parser.add_argument("-s", "--sets", type=int, default=1, help="base game sets of a generated board")
+    parser.add_argument("--seed", type=int, default=None, help="seed of a generated board")
+    parser.add_argument("-g", "--games", type=int, default=10000, help="games to simulate")
+    parser.add_argument("-t", "--turns", type=int, default=100, help="dice rolls per game")
+    parser.add_argument("--top", type=int, default=10, help="starting positions to list")
+    parser.add_argument("-o", "--output", default=None, help="write the summary json to this file instead of stdout")
+    parser.add_argument("--csv", default=None, help="also write the per intersection table to this csv file")
+    args = parser.parse_args(argv)
+    if args.archive:
+        from board_archive import BoardArchive
+        with BoardArchive(args.archive) as archive:
+            board = archive.load(args.index)
+    else:
+        from board_engine import BoardGenerator
+        board = BoardGenerator().generate({res: LAND_RESOURCE_RATIOS[res] * args.sets for res in LAND_RESOURCES}, seed=args.seed)
+
+    report = ProductionSimulator(args.games, args.turns, args.seed).run(board)
+    if args.output:
+        report.write_json(args.output, args.top)
+    else:
+        print(json.dumps(report.to_dict(args.top), indent=1))
+    if args.csv:
+        report.write_csv(args.csv)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import time
+import random
+
+import tracing
+
+# ====== ResourceSeparator         ==============================================
+class ResourceSeparator:
+    """
+    Breaks up clumps of the same resource by swapping tiles, scoring each swap incrementally.
+    Every swappable tile keeps a count of its same resource neighbors, so judging a swap only
+    looks at the two tiles and their neighbors instead of the whole board.
+    Swap partners are drawn from per resource buckets rather than by scanning every tile.
+    Works on the resource codes of a board_store.Board, water and desert tiles never move and never count towards a clump.
+    All randomness comes from rng, so a seeded rng and no time budget give the same swaps every run.
+    """
+    def __init__(self, max_iterations=None, time_budget=None, samples_per_bucket=8, rng=None):
+        self.rng = rng if rng is not None else random.Random()
+        self.max_iterations = max_iterations
+        self.time_budget = time_budget
+        self.samples_per_bucket = samples_per_bucket
+
+    def build(self, board):
+        """Indexes the swappable tiles, their neighbors and their same resource counts"""
+        self.board = board
+        self.tiles = board.productive_indices()
+        local = {board_index: i for i, board_index in enumerate(self.tiles)}
+        template = board.template
+        self.resources = [board.resources[board_index] for board_index in self.tiles]
+        self.neighbors = [[local[n] for n in template.neighbors_of(board_index) if n in local] for board_index in self.tiles]
+        self.same = [sum(1 for j in nbrs if self.resources[j] == self.resources[i]) for i, nbrs in enumerate(self.neighbors)]
+
+        self.buckets, self.bucket_pos = {}, [0] * len(self.tiles)
+        for i, res in enumerate(self.resources):
+            bucket = self.buckets.setdefault(res, [])
+            self.bucket_pos[i] = len(bucket)
+            bucket.append(i)
+
+        self.clumped, self.clumped_pos = [], {}
+        self.clumped_by_resource = {res: [] for res in self.buckets}
+        for i, score in enumerate(self.same):
+            if score: self._mark_clumped(i)
+
+    def total_score(self):
+        """Sum of get_clump_score over every tile"""
+        return sum(self.same)
+
+    def _mark_clumped(self, i):
+        if i not in self.clumped_pos:
+            bucket = self.clumped_by_resource[self.resources[i]]
+            self.clumped_pos[i] = (len(self.clumped), len(bucket))
+            self.clumped.append(i)
+            bucket.append(i)
+
+    def _unmark_clumped(self, i, res):
+        pos = self.clumped_pos.pop(i, None)
+        if pos is None: return
+        for items, at, slot in ((self.clumped, pos[0], 0), (self.clumped_by_resource[res], pos[1], 1)):
+            last = items.pop()
+            if last != i:
+                items[at] = last
+                moved = list(self.clumped_pos[last])
+                moved[slot] = at
+                self.clumped_pos[last] = tuple(moved)
+
+    def _refresh_clumped(self, i, old_res):
+        # a tile that changed resource has to leave its old clumped bucket first
+        if old_res != self.resources[i]: self._unmark_clumped(i, old_res)
+        if self.same[i]: self._mark_clumped(i)
+        else: self._unmark_clumped(i, self.resources[i])
+
+    def swap_delta(self, i, j):
+        """Change of the total clump score if tiles i and j traded resources, O(degree)"""
+        res_i, res_j = self.resources[i], self.resources[j]
+        gain_i = sum(1 for k in self.neighbors[i] if k != j and self.resources[k] == res_j)
+        gain_j = sum(1 for k in self.neighbors[j] if k != i and self.resources[k] == res_i)
+        # each same resource edge counts once on both of its tiles
+        return 2 * (gain_i + gain_j - self.same[i] - self.same[j])
+
+    def swap(self, i, j):
+        """Trades the resources of tiles i and j and updates only the counts around them"""
+        res_i, res_j = self.resources[i], self.resources[j]
+        for k in self.neighbors[i]:
+            if k == j: continue
+            if self.resources[k] == res_i: self.same[k] -= 1
+            elif self.resources[k] == res_j: self.same[k] += 1
+        for k in self.neighbors[j]:
+            if k == i: continue
+            if self.resources[k] == res_j: self.same[k] -= 1
+            elif self.resources[k] == res_i: self.same[k] += 1
+
+        self.resources[i], self.resources[j] = res_j, res_i
+        self.board.resources[self.tiles[i]], self.board.resources[self.tiles[j]] = res_j, res_i
+        self.same[i] = sum(1 for k in self.neighbors[i] if self.resources[k] == res_j)
+        self.same[j] = sum(1 for k in self.neighbors[j] if self.resources[k] == res_i)
+
+        pos_i, pos_j = self.bucket_pos[i], self.bucket_pos[j]
+        self.buckets[res_i][pos_i], self.buckets[res_j][pos_j] = j, i
+        self.bucket_pos[i], self.bucket_pos[j] = pos_j, pos_i
+
+        self._refresh_clumped(i, res_i)
+        self._refresh_clumped(j, res_j)
+        for k in self.neighbors[i] + self.neighbors[j]:
+            if k != i and k != j: self._refresh_clumped(k, self.resources[k])
+
+    def _sample(self, bucket):
+        if len(bucket) <= self.samples_per_bucket: return bucket
+        return self.rng.sample(bucket, self.samples_per_bucket)
+
+    def best_partner(self, i):
+        """
+        Samples the clumped and the full bucket of every other resource and returns the best (delta, partner).
+        A swap that leaves the score unchanged is returned when nothing improves, partner is None when every swap hurts.
+        """
+        best_delta, best_j = 1, None
+        res_i = self.resources[i]
+        for res, bucket in self.buckets.items():
+            if res == res_i or not bucket: continue
+            for j in self._sample(self.clumped_by_resource[res]) + self._sample(bucket):
+                delta = self.swap_delta(i, j)
+                if delta < best_delta:
+                    best_delta, best_j = delta, j
+        return best_delta, best_j
+
+    def run(self, board, progress=None):
+        """
+        Swaps until nothing is clumped, the iteration or time budget runs out,
+        or a long run of swaps found no improvement.
+        Swaps that keep the score level are still made so the search can walk off a plateau.
+        progress, when given, is called with a 0 to 1 estimate every few thousand iterations.
+        Returns the number of swaps made.
+        """
+        deadline = time.perf_counter() + self.time_budget if self.time_budget is not None else None
+        self.build(board)
+        if len(self.buckets) < 2:
+            return 0
+
+        max_iterations = self.max_iterations if self.max_iterations is not None else 50 * len(self.tiles)
+        patience = max(64, len(self.tiles))
+        initial_clumped = max(1, len(self.clumped))
+        swaps, failures, attempts = 0, 0, 0
+        for iteration in range(max_iterations):
+            if not self.clumped or failures > patience:
+                break
+            if deadline is not None and iteration % 64 == 0 and time.perf_counter() > deadline:
+                break
+            if progress is not None and iteration % 2048 == 0:
+                progress(max(iteration / max_iterations, 1 - len(self.clumped) / initial_clumped))
+            i = self.rng.choice(self.clumped)
+            delta, j = self.best_partner(i)
+            attempts += 1
+            if j is None:
+                failures += 1
+                continue
+            self.swap(i, j)
+            swaps += 1
+            failures = 0 if delta < 0 else failures + 1
+        # totals only, counting inside the loop would cost even with tracing off
+        tracing.count("separation_swaps_attempted", attempts)
+        tracing.count("separation_swaps_accepted", swaps)
+        return swaps
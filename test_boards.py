@@ -0,0 +1,90 @@
+import random
+
+from globals import LAND_RESOURCES, LAND_RESOURCE_RATIOS, RED_NUMBERS
+from batch import iter_boards, board_seeds
+from board_engine import BoardGenerator
+from board_archive import BoardArchive, encode_board, decode_board
+from board_stats import BoardStats
+from board_store import NO_NUMBER
+from number_placement import PIPS, DEFAULT_MAX_INTERSECTION_PIPS
+from topology import coastline
+
+# 19 land cells around a one tile lake
+LAKE_MASK = ["xxxxx", "xx.xx", "xxxxx", "xxxxx"]
+
+def counts_for_sets(sets): return {res: LAND_RESOURCE_RATIOS[res] * sets for res in LAND_RESOURCES}
+
+# ====== Seeded generation         ==============================================
+def test_parallel_boards_match_serial():
+    seeds = board_seeds(7, 12)
+    serial = list(iter_boards(counts_for_sets(2), seeds))
+    parallel = list(iter_boards(counts_for_sets(2), seeds, processes=2, chunksize=3))
+    assert [board["seed"] for board in serial] == list(seeds)
+    assert parallel == serial
+
+def test_seed_gives_the_same_board():
+    first, second = (list(iter_boards(counts_for_sets(1), [42])) for _ in range(2))
+    assert first == second
+
+# ====== Number placement          ==============================================
+def test_numbers_follow_the_rules():
+    for mask, sets, orientation in ((None, 3, 'pointy'), (None, 12, 'flat'), (LAKE_MASK, 1, 'pointy')):
+        board = BoardGenerator(mask=mask).generate(counts_for_sets(sets), seed=8)
+        template, numbers = board.template, board.numbers
+        assert board.orientation == orientation
+        for index in range(template.num_tiles):
+            if numbers[index] == NO_NUMBER: continue
+            for neighbor in template.neighbors_of(index):
+                assert numbers[neighbor] != numbers[index]
+                assert not (numbers[index] in RED_NUMBERS and numbers[neighbor] in RED_NUMBERS)
+        corners = template.intersections
+        for k in range(0, len(corners), 3):
+            pips = sum(PIPS[numbers[tile]] for tile in corners[k:k + 3] if numbers[tile] != NO_NUMBER)
+            assert pips <= DEFAULT_MAX_INTERSECTION_PIPS
+
+# ====== Coastline                 ==============================================
+def test_coastline_covers_every_coastal_tile():
+    for mask, sets in ((None, 1), (None, 3), (None, 12), (LAKE_MASK, 1)):
+        board = BoardGenerator(mask=mask).generate(counts_for_sets(sets), seed=1)
+        template = board.template
+        coastal = {water for water in range(template.num_water)
+                   if any(n >= template.num_water for n in template.neighbors_of(water))}
+        loops = coastline(template)
+        for loop in loops:
+            assert len({water for water, _ in loop}) == len(loop)
+        assert {water for loop in loops for water, _ in loop} == coastal
+        # harbors sit on the coast and never share an edge
+        harbors = [index for index, harbor in enumerate(board.harbors) if harbor]
+        assert harbors and set(harbors) <= coastal
+        assert not any(n in harbors for index in harbors for n in template.neighbors_of(index))
+
+# ====== Board archive             ==============================================
+def test_archive_record_round_trip():
+    for board in (BoardGenerator().generate(counts_for_sets(3), seed=5),
+                  BoardGenerator(mask=LAKE_MASK).generate(counts_for_sets(1), seed=6)):
+        decoded = decode_board(encode_board(board))
+        assert decoded.to_dict() == board.to_dict()
+        assert encode_board(decoded) == encode_board(board)
+
+def test_archive_file_round_trip(tmp_path):
+    boards = [BoardGenerator().generate(counts_for_sets(sets), seed=seed) for sets, seed in ((1, 3), (4, 9), (2, 11))]
+    path = str(tmp_path / "boards.mcb")
+    with BoardArchive(path, "a") as archive:
+        assert [archive.append(board) for board in boards] == [0, 1, 2]
+    with BoardArchive(path) as archive:
+        assert len(archive) == 3
+        assert [archive.load(i).to_dict() for i in range(3)] == [board.to_dict() for board in boards]
+        assert archive.load_seed(9).to_dict() == boards[1].to_dict()
+        assert archive.find_seed(10) is None
+
+# ====== Tile editing              ==============================================
+def test_stats_follow_edits():
+    board = BoardGenerator().generate(counts_for_sets(4), seed=21)
+    stats, rng = BoardStats(board), random.Random(21)
+    land = range(board.template.num_water, board.template.num_tiles)
+    for _ in range(300):
+        if rng.random() < 0.5:
+            stats.swap(rng.choice(land), rng.choice(land))
+        else:
+            stats.edit(rng.choice(land), rng.choice(LAND_RESOURCES), rng.choice([None, 2, 3, 4, 5, 6, 8, 9, 10, 11, 12]))
+        assert vars(stats) == vars(BoardStats(board))
@@ -0,0 +1,245 @@
+import math
+from functools import lru_cache
+from array import array
+
+import tracing
+from geometry import unit_centers
+
+# Number of board skeletons kept around, each distinct land tile count is one entry
+TEMPLATE_CACHE_SIZE = 16
+
+def get_neighbors(r, c, orientation):
+    if orientation == 'flat':
+        if c % 2 == 0: offsets = [(-1,0),(-1,1),(0,1),(1,0),(0,-1),(-1,-1)]
+        else: offsets = [(-1,0),(0,1),(1,1),(1,0),(1,-1),(0,-1)]
+        return [(r + dr, c + dc) for dr, dc in offsets]
+    else:
+        q, r_ax = r, c
+        axial_offsets = [(0,1),(1,0),(1,-1),(0,-1),(-1,0),(-1,1)]
+        return [(q + dq, r_ax + dr) for dq, dr in axial_offsets]
+
+# Side of a water tile that faces the land tile in direction d of its get_neighbors list, indexed by d.
+# get_neighbors lists the six directions in turning order, so direction d + 3 points back.
+HARBOR_SIDES = {'pointy': (2, 3, 4, 5, 0, 1), 'flat': (4, 3, 2, 1, 0, 5)}
+
+# ====== Board skeletons           ==============================================
+def hexagonal_land_coords(num_land_tiles):
+    """
+    For when the resourse tiles are less than 100, the classic hexagonal shape will be generated
+    Will use axial coordinates, returns (coords, core_rows, core_cols)
+    """
+    n = 2
+    while (3 * n * n - 3 * n + 1) < num_land_tiles:
+        n += 1
+
+    coords = []
+    for q in range(-n + 1, n):
+        r1 = max(-n + 1, -q - n + 1)
+        r2 = min(n - 1, -q + n - 1)
+        for r in range(r1, r2 + 1):
+            if len(coords) == num_land_tiles: break
+            coords.append((q, r))
+    return coords, 2 * n - 1, 2 * n - 1
+
+def rectangular_land_coords(num_land_tiles, aspect_ratio=None):
+    """
+    When resource tiles are more than 100, will result in a more rectangular shape board.
+    Full rows of cols tiles plus a centered, partly filled last row, so any count (primes too) stays compact.
+    aspect_ratio is the drawn width / height of the land, None picks the fewest rows + cols, which keeps the
+    water ring and coastline shortest, and takes an exact rectangle when one is just as short.
+    """
+    if aspect_ratio is None:
+        cols = math.isqrt(num_land_tiles - 1) + 1
+        rows = -(-num_land_tiles // cols)
+        for i in range(math.isqrt(num_land_tiles), 0, -1):
+            if num_land_tiles % i == 0:
+                if i + num_land_tiles // i <= rows + cols: rows, cols = i, num_land_tiles // i
+                break
+    else:
+        # flat columns are 1.5 hex sizes apart, rows sqrt(3)
+        cols = max(1, min(num_land_tiles, round(math.sqrt(num_land_tiles * aspect_ratio * math.sqrt(3) / 1.5))))
+        rows = -(-num_land_tiles // cols)
+
+    # use col/row layout
+    coords = [(r, c) for r in range(rows - 1) for c in range(cols)]
+    last_row = num_land_tiles - len(coords)
+    start = (cols - last_row) // 2
+    coords.extend((rows - 1, c) for c in range(start, start + last_row))
+    return coords, rows, cols
+
+# Mask characters that mean water, anything else is land
+MASK_WATER = ". "
+
+def mask_land_cells(mask):
+    """(row, column) of every land cell of a mask in reading order, as drawn"""
+    return [(r, c) for r, line in enumerate(mask) for c, cell in enumerate(line) if cell not in MASK_WATER]
+
+def mask_land_coords(mask, num_land_tiles, orientation):
+    """
+    Land cells of a user drawn mask, one string per row, '.' and ' ' are water and anything else is land.
+    Masks are drawn offset: odd rows sit half a hex to the right on pointy boards, odd columns half a hex
+    lower on flat ones. The first num_land_tiles land cells in reading order are used, returns (coords, rows, cols).
+    """
+    cells = mask_land_cells(mask)
+    if len(cells) < num_land_tiles:
+        raise ValueError(f"the mask has {len(cells)} land cells, {num_land_tiles} are needed")
+    cells = cells[:num_land_tiles]
+    if orientation == 'pointy':
+        cells = [(r, c - r // 2) for r, c in cells]   # offset rows to axial
+    return cells, len(mask), max(map(len, mask), default=0)
+
+def water_ring(land_coords, orientation):
+    """Every non land neighbor of a land tile, sorted so the skeleton is the same on every run"""
+    water_coords = set()
+    for r_coord, c_coord in land_coords:
+        for neighbor_coord in get_neighbors(r_coord, c_coord, orientation):
+            if neighbor_coord not in land_coords:
+                water_coords.add(neighbor_coord)
+    return sorted(water_coords)
+
+def land_intersections(template):
+    """
+    The corners where three land tiles meet, as a flat array of tile index triples (a, b, c, a, b, c, ...).
+    Three tiles share a corner exactly when they are all neighbors of each other.
+    """
+    intersections = array('i')
+    for u in range(template.num_water, template.num_tiles):
+        land_neighbors = [n for n in template.neighbors_of(u) if n > u]   # land follows water in the index
+        for i, v in enumerate(land_neighbors):
+            v_neighbors = template.neighbors_of(v)
+            for w in land_neighbors[i + 1:]:
+                if w in v_neighbors:
+                    intersections.extend((u, min(v, w), max(v, w)))
+    return intersections
+
+def coastline(template):
+    """
+    Walks every shore edge by edge, keeping land on the same hand, and returns one loop per shore:
+    [[(water index, side facing land), ...], ...] in walk order. Each water tile is listed once, its side
+    is the middle of the land edges it touches. Only shore edges are visited, so this is O(perimeter).
+    """
+    directions, num_water = template.directions, template.num_water
+    sides = HARBOR_SIDES[template.orientation]
+    seen, loops = set(), []
+    for water in range(num_water):
+        for d in range(6):
+            land = directions[6 * water + d]
+            if land < num_water or (land, (d + 3) % 6) in seen:
+                continue
+            order, touching = [], {}
+            edge = (land, (d + 3) % 6)
+            while edge not in seen:
+                seen.add(edge)
+                land, e = edge
+                shore = directions[6 * land + e]
+                if shore not in touching:
+                    touching[shore] = []
+                    order.append(shore)
+                touching[shore].append(sides[(e + 3) % 6])
+                # turn around the corner shared by land, shore and the next tile over
+                turn = directions[6 * land + (e + 1) % 6]
+                edge = (land, (e + 1) % 6) if turn < num_water else (turn, (e - 1) % 6)
+            loops.append([(shore, touching[shore][len(touching[shore]) // 2]) for shore in order])
+    return loops
+
+def find_harbor_slots(template):
+    """
+    Every other water tile around each shore, spread evenly over the loop.
+    A slot that would touch a harbor already placed is skipped, so harbors never share an edge.
+    Returns ((index, orientation), ...) where orientation is the side facing land.
+    """
+    harbor_slots, blocked = [], set()
+    for loop in coastline(template):
+        count = max(1, len(loop) // 2)
+        for k in range(count):
+            index, side = loop[k * len(loop) // count]
+            if index in blocked: continue
+            harbor_slots.append((index, side))
+            blocked.add(index)
+            blocked.update(template.neighbors_of(index))
+    return tuple(harbor_slots)
+
+# ====== BoardTemplate             ==============================================
+class BoardTemplate:
+    """
+    Everything about a board that only depends on its land tile count, orientation and shape options:
+    coordinates, adjacency, the corners shared by three land tiles, harbor slots and the unit hexagon centers.
+    Tiles are numbered water first, then land, and everything is stored in typed arrays by that index:
+    - rows, cols: the (r, c) of every tile
+    - directions: directions[6 * i + d] is the neighbor of tile i in direction d of get_neighbors, -1 off the board
+    - neighbor_start, neighbor_list: on board neighbors of tile i are neighbor_list[neighbor_start[i]:neighbor_start[i + 1]]
+    - cell_index: dense (r, c) -> index table over the bounding box, -1 off the board
+    - intersections: flat index triples, see land_intersections
+    - harbor_slots: ((index, orientation), ...)
+    - unit_centers: (N, 2) NumPy array
+    Templates are cached and shared between boards, so treat them as read only.
+    """
+    __slots__ = ("orientation", "board_shape", "core_rows", "core_cols", "num_water", "num_tiles", "rows", "cols",
+                 "row0", "col0", "height", "width", "cell_index", "directions", "neighbor_start", "neighbor_list",
+                 "intersections", "harbor_slots", "unit_centers")
+
+    def __init__(self, num_land_tiles, orientation, aspect_ratio=None, mask=None):
+        self.orientation = orientation
+        with tracing.phase("skeleton"):
+            if mask is not None:
+                self.board_shape = "Custom"
+                land_coords, self.core_rows, self.core_cols = mask_land_coords(mask, num_land_tiles, orientation)
+            elif orientation == 'pointy':
+                self.board_shape = "Hexagonal"
+                land_coords, self.core_rows, self.core_cols = hexagonal_land_coords(num_land_tiles)
+            else:
+                self.board_shape = "Rectangular"
+                land_coords, self.core_rows, self.core_cols = rectangular_land_coords(num_land_tiles, aspect_ratio)
+            water_coords = water_ring(frozenset(land_coords), orientation)
+        with tracing.phase("template_build"):
+            self._build(water_coords, land_coords)
+
+    @classmethod
+    def from_coords(cls, water_coords, land_coords, orientation, board_shape="", core_rows=0, core_cols=0):
+        """Template over coordinates saved earlier, in the given order, see board_archive"""
+        template = cls.__new__(cls)
+        template.orientation, template.board_shape = orientation, board_shape
+        template.core_rows, template.core_cols = core_rows, core_cols
+        template._build(list(water_coords), list(land_coords))
+        return template
+
+    def _build(self, water_coords, land_coords):
+        orientation = self.orientation
+        tile_coords = water_coords + land_coords
+        self.num_water, self.num_tiles = len(water_coords), len(tile_coords)
+        self.rows = array('i', (r for r, _ in tile_coords))
+        self.cols = array('i', (c for _, c in tile_coords))
+
+        self.row0, self.col0 = min(self.rows, default=0), min(self.cols, default=0)
+        self.height = max(self.rows, default=-1) - self.row0 + 1
+        self.width = max(self.cols, default=-1) - self.col0 + 1
+        self.cell_index = array('i', [-1]) * (self.height * self.width)
+        for index, (r, c) in enumerate(tile_coords):
+            self.cell_index[(r - self.row0) * self.width + (c - self.col0)] = index
+
+        self.directions = array('i', (self.index_of(*neighbor) for r, c in tile_coords
+                                      for neighbor in get_neighbors(r, c, orientation)))
+        self.neighbor_start, self.neighbor_list = array('i', [0]), array('i')
+        for i in range(self.num_tiles):
+            self.neighbor_list.extend(index for index in self.directions[6 * i:6 * i + 6] if index >= 0)
+            self.neighbor_start.append(len(self.neighbor_list))
+
+        self.intersections = land_intersections(self)
+        self.harbor_slots = find_harbor_slots(self)
+        self.unit_centers = unit_centers(tile_coords, orientation)
+        self.unit_centers.flags.writeable = False
+
+    def index_of(self, r, c):
+        """Dense index arithmetic instead of a dict lookup, -1 when (r, c) is not on the board"""
+        row, col = r - self.row0, c - self.col0
+        if 0 <= row < self.height and 0 <= col < self.width:
+            return self.cell_index[row * self.width + col]
+        return -1
+
+    def neighbors_of(self, index):
+        return self.neighbor_list[self.neighbor_start[index]:self.neighbor_start[index + 1]]
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def get_template(num_land_tiles, orientation, aspect_ratio=None, mask=None):
+    """Builds the skeleton for a tile count once, repeat generations reuse it. mask has to be a tuple of strings"""
+    return BoardTemplate(num_land_tiles, orientation, aspect_ratio, mask)
@@ -0,0 +1,163 @@
+import json
+import time
+import threading
+from collections import deque
+
+# ====== Opt in instrumentation    ==============================================
+# Off by default. While off, phase() hands back one shared do nothing context manager and count() returns
+# after one check, and nothing is counted inside the hot loops (those report their totals when they finish),
+# so leaving the calls in costs next to nothing.
+# Each thread traces its own runs, a generation on a worker thread and a paint on the GUI thread do not mix.
+_enabled = False
+_listeners = []
+_local = threading.local()
+# Finished runs kept for last_trace() and write_json()
+HISTORY_SIZE = 64
+_history = deque(maxlen=HISTORY_SIZE)
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+def is_enabled(): return _enabled
+
+def add_listener(listener):
+    """
+    listener(event, trace, name, value) is called on the thread that traced, for these events:
+    - "start": a run named name began
+    - "phase": phase name took value seconds
+    - "count": counter name went up by value
+    - "end": the run finished, trace holds all of it
+    """
+    _listeners.append(listener)
+
+def remove_listener(listener): _listeners.remove(listener)
+
+def _notify(event, trace, name, value):
+    for listener in list(_listeners):
+        listener(event, trace, name, value)
+
+# ====== Trace                     ==============================================
+class Trace:
+    """One traced run: its phases as (name, start offset, seconds, depth) in the order they finished, and its counters"""
+    def __init__(self, name):
+        self.name = name
+        self.thread = threading.get_ident()
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+        self.phases = []
+        self.counters = {}
+        self.depth = 0
+
+    def phase_totals(self):
+        """{phase: total seconds} over repeated phases, the breakdown an overlay shows"""
+        totals = {}
+        for name, _, seconds, _ in self.phases:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def to_dict(self):
+        return {"name": self.name, "started": self.wall_start, "seconds": self.seconds,
+                "phases": [{"name": name, "offset": offset, "seconds": seconds, "depth": depth}
+                           for name, offset, seconds, depth in self.phases],
+                "counters": dict(self.counters)}
+
+    def trace_events(self, pid=1):
+        """Chrome trace format events (chrome://tracing, Perfetto) of this run"""
+        start_us = self.wall_start * 1e6
+        events = [{"name": self.name, "ph": "X", "ts": start_us, "dur": self.seconds * 1e6, "pid": pid, "tid": self.thread}]
+        events += [{"name": name, "ph": "X", "ts": start_us + offset * 1e6, "dur": seconds * 1e6, "pid": pid, "tid": self.thread}
+                   for name, offset, seconds, _ in self.phases]
+        if self.counters:
+            events.append({"name": f"{self.name} counters", "ph": "C", "ts": start_us + self.seconds * 1e6,
+                           "pid": pid, "tid": self.thread, "args": dict(self.counters)})
+        return events
+
+class _NullContext:
+    def __enter__(self): return None
+    def __exit__(self, *exc_info): return False
+
+_NULL = _NullContext()
+
+class _Phase:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace, name):
+        self.trace, self.name = trace, name
+
+    def __enter__(self):
+        self.trace.depth += 1
+        self.start = time.perf_counter()
+        return self.trace
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        trace = self.trace
+        trace.depth -= 1
+        trace.phases.append((self.name, self.start - trace.start, seconds, trace.depth))
+        if _listeners: _notify("phase", trace, self.name, seconds)
+        return False
+
+class _Run:
+    __slots__ = ("trace", "outer")
+
+    def __init__(self, name):
+        self.trace, self.outer = Trace(name), None
+
+    def __enter__(self):
+        self.outer = getattr(_local, "trace", None)
+        _local.trace = self.trace
+        if _listeners: _notify("start", self.trace, self.trace.name, None)
+        return self.trace
+
+    def __exit__(self, *exc_info):
+        trace = self.trace
+        trace.seconds = time.perf_counter() - trace.start
+        _local.trace = self.outer
+        _history.append(trace)
+        if _listeners: _notify("end", trace, trace.name, trace.seconds)
+        return False
+
+# ====== Hooks                     ==============================================
+def run(name):
+    """Context manager tracing one run (a generation, a paint), runs started inside another one nest as a phase"""
+    if not _enabled: return _NULL
+    if getattr(_local, "trace", None) is not None: return phase(name)
+    return _Run(name)
+
+def phase(name):
+    """Context manager timing one phase of the current run, does nothing outside a run"""
+    if not _enabled: return _NULL
+    trace = getattr(_local, "trace", None)
+    return _Phase(trace, name) if trace is not None else _NULL
+
+def count(name, n=1):
+    """Adds n to a counter of the current run"""
+    if not _enabled: return
+    trace = getattr(_local, "trace", None)
+    if trace is None: return
+    trace.counters[name] = trace.counters.get(name, 0) + n
+    if _listeners: _notify("count", trace, name, n)
+
+def last_trace(name=None):
+    """The latest finished run, of that name when given, None when there is none"""
+    for trace in reversed(_history):
+        if name is None or trace.name == name:
+            return trace
+    return None
+
+def traces(): return list(_history)
+
+def clear(): _history.clear()
+
+def write_json(path, runs=None):
+    """
+    Writes runs as json, by default the kept history which only holds the last HISTORY_SIZE runs (collect
+    more with a listener), loadable in chrome://tracing and Perfetto
+    through traceEvents, with the plain runs next to them under "runs".
+    """
+    runs = traces() if runs is None else runs
+    with open(path, "w") as out:
+        json.dump({"traceEvents": [event for trace in runs for event in trace.trace_events()],
+                   "displayTimeUnit": "ms", "runs": [trace.to_dict() for trace in runs]}, out, indent=1)